@@ -1,7 +1,15 @@
+import hmac
+import logging
 import os
 from core.config.config import RAG_MODEL, CONVERSION_RAG_MODEL
 from core.models.rag_system_factory import RAGSystemFactory
 
+logger = logging.getLogger(__name__)
+
+# Expected login credentials, read once at import
+_EXPECTED_LOGIN_ID = os.getenv("LOGIN_ID", "")
+_EXPECTED_LOGIN_PASSWORD = os.getenv("LOGIN_PASSWORD", "")
+
 
 class Middleware:
     """Middleware layer to interface with the RAG system"""
@@ -10,6 +18,11 @@ class Middleware:
         self.rag_system = RAGSystemFactory.get_rag_system(RAG_MODEL)
         self.conversion_rag_system = RAGSystemFactory.get_rag_system(CONVERSION_RAG_MODEL)
 
+    def warmup(self):
+        """Warm up both RAG systems before serving traffic"""
+        self.rag_system.warmup()
+        self.conversion_rag_system.warmup()
+
     def answer_question(self,question: str, file_filter=None, conversation_history=None) -> dict:
         """
         Answer a user question using the RAG pipeline
@@ -22,8 +35,17 @@ class Middleware:
         Returns:
             dict: Response containing answer, sources, and metadata
         """
-        print(file_filter)
+        logger.debug("file_filter=%s", file_filter)
         return self.rag_system.answer_question(question, file_filter, conversation_history)
+
+    def stream_answer_question(self, question: str, file_filter=None, conversation_history=None):
+        """
+        Stream the answer to a user question as it is generated
+
+        Returns:
+            iterator of dicts: 'token' events followed by a final sources event
+        """
+        return self.rag_system.stream_answer_question(question, file_filter, conversation_history)
     
     def get_model_name(self):
         """Return the name of the model being used"""
@@ -37,7 +59,7 @@ class Middleware:
         """Return statistics about the RAG system"""
         return self.rag_system.get_statistics()
 
-    def convert_code(self, question: str, conversation_history=None) -> dict:
+    async def convert_code(self, question: str, conversation_history=None) -> dict:
         """
         Convert code using the conversion assistant RAG system
 
@@ -48,14 +70,24 @@ class Middleware:
         Returns:
             dict: Response containing answer, sources, and metadata
         """
-        return self.conversion_rag_system.convert_code(question, conversation_history)
+        return await self.conversion_rag_system.convert_code(question, conversation_history)
+
+    def stream_convert_code(self, question: str, conversation_history=None):
+        """
+        Stream a code conversion as it is generated
+
+        Returns:
+            async iterator of dicts: 'token' events followed by a final sources event
+        """
+        return self.conversion_rag_system.stream_convert_code(question, conversation_history)
     
-    @staticmethod
     def login(self, login_id: str, login_password: str) -> dict:
         """Handle user login by verifying credentials"""
-        login_id= os.getenv("LOGIN_ID")
-        login_password = os.getenv("LOGIN_PASSWORD")
-        if login_id == os.getenv("LOGIN_ID") and login_password == os.getenv("LOGIN_PASSWORD"):
+        # Constant-time comparisons; '&' evaluates both so timing doesn't reveal which field failed
+        id_ok = hmac.compare_digest(login_id.encode(), _EXPECTED_LOGIN_ID.encode())
+        password_ok = hmac.compare_digest(login_password.encode(), _EXPECTED_LOGIN_PASSWORD.encode())
+        configured = bool(_EXPECTED_LOGIN_ID and _EXPECTED_LOGIN_PASSWORD)
+        if configured & id_ok & password_ok:
             return {"message": "Login successful"}
         else:
             return {"error": "Invalid login credentials"}
\ No newline at end of file
@@ -1,13 +1,37 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List, Union
 from communication.middleware.middleware import Middleware
-import logging, datetime
+import json, logging, os, time
+from contextlib import asynccontextmanager
+from functools import lru_cache
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
+
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "warning").upper(), format="%(asctime)s - %(levelname)s - %(message)s")
+http_logger = logging.getLogger("leaplogic.http")
+
+
+@lru_cache(maxsize=1)
+def get_middleware() -> Middleware:
+    """Build the shared Middleware (and its RAG systems) on first use"""
+    return Middleware()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load and warm the models before the server starts accepting requests"""
+    middleware_instance = await run_in_threadpool(get_middleware)
+    await run_in_threadpool(middleware_instance.warmup)
+    yield
+
+
+api = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
+
+# Static payload for the liveness endpoint, serialised once
+_ROOT = ORJSONResponse({"message": "LeapLogic RAG API is running", "version": "1.0.0"}).body
 
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
-api = FastAPI()
-middleware_instance = Middleware()
 
 api.add_middleware(
     CORSMiddleware,
@@ -21,13 +45,34 @@ class QuestionRequest(BaseModel):
     question: str
     file_filter: Optional[Union[str, List[str]]] = None
     conversation_history: Optional[List[dict]] = None
+    stream: bool = False
 
 class LoginRequest(BaseModel):
     login_id: str
     login_password: str
 
+
+def format_sse(event: dict) -> str:
+    """Encode a streamed event; tokens are plain data events, metadata is a 'sources' event"""
+    if "token" in event:
+        return f"data: {json.dumps(event)}\n\n"
+    return f"event: sources\ndata: {json.dumps(event)}\n\n"
+
+
+def sse_stream(events):
+    """Wrap a (sync) event iterator as a text/event-stream response"""
+    return StreamingResponse((format_sse(event) for event in events), media_type="text/event-stream")
+
+
+def async_sse_stream(events):
+    """Wrap an async event iterator as a text/event-stream response"""
+    async def body():
+        async for event in events:
+            yield format_sse(event)
+    return StreamingResponse(body(), media_type="text/event-stream")
+
 @api.post("/login")
-async def login(request: LoginRequest):
+async def login(request: LoginRequest, middleware_instance: Middleware = Depends(get_middleware)):
     """Handle user login by verifying credentials"""
     try:
         result = middleware_instance.login(request.login_id, request.login_password)
@@ -36,21 +81,31 @@ async def login(request: LoginRequest):
         return {"error": str(e)}
 
 @api.post("/generate-answer")
-async def answer_question(request: QuestionRequest):
+async def answer_question(request: QuestionRequest, middleware_instance: Middleware = Depends(get_middleware)):
     """
     Answer a question using the RAG system
     
     Args:
-        String question, optional file_filter, and optional conversation_history
+        String question, optional file_filter, optional conversation_history,
+        and optional stream flag
         
     Returns:
-        dict: Response containing answer, sources, and metadata
+        dict: Response containing answer, sources, and metadata, or a
+        text/event-stream of answer tokens followed by a sources event
+        when stream is true
     """
+    if request.stream:
+        # Sync generator: Starlette iterates it in the threadpool
+        return sse_stream(middleware_instance.stream_answer_question(request.question,
+                                                                     request.file_filter,
+                                                                     request.conversation_history))
     try:
-        result = middleware_instance.answer_question(request.question,
-                                            request.file_filter,
-                                            request.conversation_history
-                                            )
+        # Retrieval and Gemma generation are blocking; keep them off the event loop
+        result = await run_in_threadpool(middleware_instance.answer_question,
+                                         request.question,
+                                         request.file_filter,
+                                         request.conversation_history
+                                         )
         return result
     except Exception as e:
         return {"error": str(e), "answer": "", "sources": []}
@@ -58,19 +113,19 @@ async def answer_question(request: QuestionRequest):
 @api.get("/")
 async def root():
     """Root endpoint to check if the API is running"""
-    return {"message": "LeapLogic RAG API is running", "version": "1.0.0"}
+    return Response(_ROOT, media_type="application/json")
 
 @api.get("/get-statistics")
-async def get_statistics():
+async def get_statistics(middleware_instance: Middleware = Depends(get_middleware)):
     """Health check endpoint"""
     try:
-        result = middleware_instance.get_statistics()
+        result = await run_in_threadpool(middleware_instance.get_statistics)
         return result
     except Exception as e:
         return {"error": str(e), "answer": "", "sources": []}
 
 @api.get("/get-model-name")
-async def get_model_name():
+async def get_model_name(middleware_instance: Middleware = Depends(get_middleware)):
     """Endpoint to get the name of the model being used"""
     try:
         model_name = middleware_instance.get_model_name()
@@ -80,27 +135,32 @@ async def get_model_name():
     
     
 @api.post("/reload-knowledge-base")
-async def reload_knowledge_base():
+async def reload_knowledge_base(middleware_instance: Middleware = Depends(get_middleware)):
     """Endpoint to reload the knowledge base"""
     try:
-        middleware_instance.reload_knowledge_base()
+        await run_in_threadpool(middleware_instance.reload_knowledge_base)
         return {"message": "Knowledge base reloaded successfully"}
     except Exception as e:
         return {"error": str(e)}
     
 @api.post("/convert-code")
-async def convert_code(request: QuestionRequest):
+async def convert_code(request: QuestionRequest, middleware_instance: Middleware = Depends(get_middleware)):
     """
     Convert code using the conversion assistant RAG system
     
     Args:
-        String question, optional file_filter, and optional conversation_history
+        String question, optional file_filter, optional conversation_history,
+        and optional stream flag
         
     Returns:
-        dict: Response containing converted code, sources, and metadata
+        dict: Response containing converted code, sources, and metadata, or a
+        text/event-stream of tokens followed by a sources event when stream is true
     """
+    if request.stream:
+        return async_sse_stream(middleware_instance.stream_convert_code(request.question,
+                                                                        request.conversation_history))
     try:
-        result = middleware_instance.convert_code(
+        result = await middleware_instance.convert_code(
             request.question,
             request.conversation_history
         )
@@ -109,16 +169,23 @@ async def convert_code(request: QuestionRequest):
         return {"error": str(e), "answer": "", "sources": []}
 
     
-@api.middleware("http")
 async def log_requests(request, call_next):
-    start_time = datetime.datetime.now()    
+    start_ns = time.perf_counter_ns()
     client_ip = request.client.host
     method = request.method
     path = request.url.path
-    logging.info(f"Incoming request: {method} {path} from {client_ip} at {start_time}")
+    if http_logger.isEnabledFor(logging.DEBUG):
+        http_logger.debug("Incoming request: %s %s from %s", method, path, client_ip)
     
     response = await call_next(request)
     
-    process_time = (datetime.datetime.now() - start_time).total_seconds()
-    logging.info(f"Completed {method} {path} in {process_time}s with status {response.status_code}")
-    return response
\ No newline at end of file
+    http_logger.info("Completed %s %s from %s in %.3fms with status %d", method, path, client_ip,
+                     (time.perf_counter_ns() - start_ns) / 1e6, response.status_code)
+    return response
+
+# Per-request logging is opt-in (DEBUG_HTTP=1); it doubles the Python work done per request.
+# Its logger is raised to INFO so the completion lines show under the default WARNING root level
+if os.getenv("DEBUG_HTTP"):
+    if not http_logger.isEnabledFor(logging.INFO):
+        http_logger.setLevel(logging.INFO)
+    api.middleware("http")(log_requests)
@@ -0,0 +1,45 @@
+"""
+Launcher for the LeapLogic RAG API.
+Keeps the uvicorn server settings in one place so every deployment runs the
+same tuned configuration.
+
+Usage: python -m communication.rest_api.server
+
+Environment:
+    HOST, PORT       bind address (default 0.0.0.0:8000)
+    LOG_LEVEL        uvicorn log level (default warning)
+    DEV              set to enable auto-reload; never enable it in production
+    WEB_CONCURRENCY  worker processes (default 1). Each worker loads its own
+                     embedding model and RAG systems; there is no shared state
+                     between requests, so more than one worker is safe.
+"""
+import os
+
+import uvicorn
+
+APP = "communication.rest_api.app:api"
+
+
+def server_options(host: str = None, port: int = None) -> dict:
+    """Keyword arguments for uvicorn.run"""
+    return {
+        "host": host or os.getenv("HOST", "0.0.0.0"),
+        "port": port or int(os.getenv("PORT", "8000")),
+        "loop": "auto",  # uvloop when installed, asyncio otherwise
+        "http": "auto",  # httptools (C parser) when installed, h11 otherwise
+        "backlog": 2048,
+        "log_level": os.getenv("LOG_LEVEL", "warning"),
+        "access_log": False,
+        "reload": bool(os.getenv("DEV")),
+        "workers": int(os.getenv("WEB_CONCURRENCY", "1")),
+    }
+
+
+def run(host: str = None, port: int = None):
+    """Start the API server and block until it exits"""
+    # uvicorn.run (rather than Server.run) honours the reload and multi-worker supervisors
+    uvicorn.run(APP, **server_options(host, port))
+
+
+if __name__ == "__main__":
+    run()
@@ -1,30 +1,36 @@
 # CONFIGURATION
 
 import os
+from functools import lru_cache
 from core.models.rag_system_factory import RAGSystemFactory, RAGSystemType
 
 # Get the parent folder's docs directory
 DOCS_FOLDER = "docs" #os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "docs"))
 
 VECTOR_DB_FILE = "vector.db"
-EMBEDDINGS_CACHE = "embeddings_cache.pkl"
-DOCS_CACHE = "docs_cache.pkl"
 CONFIG_FILE = "rag_config.json"
 
 CHUNK_SIZE = 1000  # Words per chunk (increased for better context)
+CHUNK_MAX_TOKENS = None  # Optional token budget per chunk, including the model's [CLS]/[SEP] (e.g. 256, the embedding model's max_seq_length); None chunks by words only
 TOP_K_RETRIEVAL = 5  # Number of chunks to retrieve (increased for more complete answers)
 EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+INGEST_BATCH_SIZE = 256  # Chunks per embedding batch when loading documents
+STORE_DOCUMENT_CONTENT = False  # Keep a zlib-compressed copy of each file in the DB (files are re-read from disk otherwise)
+EMBEDDING_STORAGE_DTYPE = "float16"  # Stored embedding precision; float16 halves DB size and scan bandwidth
+SEARCH_INT8 = False  # Memory-only option: keep the search index as int8 with per-row scales (4x less resident memory). Scoring is no faster than float32, and quantization can swap near-tied files; False keeps float32
+SEARCH_ANN = False  # Query an HNSW index (requires hnswlib) instead of scanning every chunk; exact scan when unset or unavailable
+SEARCH_VERBOSE = False  # Print per-query search diagnostics, such as the files matched by the "*" filter
 
 # DEVICE CONFIGURATION - Robust device detection
+@lru_cache(maxsize=1)
 def get_device():
     """Safely detect the best available device"""
     try:
         import torch
+        # Queries the driver without creating a CUDA context; a faulty driver
+        # surfaces on the model's first allocation, where EmbeddingManager
+        # falls back to CPU
         if torch.cuda.is_available() and torch.cuda.device_count() > 0:
-            # Test CUDA by trying to create a tensor
-            torch.cuda.init()
-            test_tensor = torch.zeros(1).cuda()
-            del test_tensor
             return "cuda"
         else:
             return "cpu"
@@ -19,6 +19,10 @@ class BaseRAGSystem(ABC):
         """
         pass
     
+    def warmup(self):
+        """Prepare models ahead of the first request; no-op by default"""
+        pass
+
     @abstractmethod
     def get_statistics(self) -> dict:
         """Return statistics about the RAG system"""
@@ -11,8 +11,8 @@ from core.config import config
 from typing import Union, List
 import google.generativeai as genai
 import ssl
-import sqlite3
 from datetime import datetime
+from functools import lru_cache
 from core.models.base_rag_system import BaseRAGSystem
 import os
 
@@ -34,45 +34,64 @@ genai.configure(api_key=config.API_KEY, transport='rest')
 # ==============================
 
 
+@lru_cache(maxsize=4)
+def get_gemma_model(model_name: str) -> genai.GenerativeModel:
+    """One SDK client per model name, shared by every RAG system in the process"""
+    return genai.GenerativeModel(model_name)
+
+
 class GemmaAnswerGenerator:
     """Generates answers using Gemma model"""
 
     def __init__(self):
-        self.model = genai.GenerativeModel(config.GEMMA_MODEL)
+        self.model = get_gemma_model(config.GEMMA_MODEL)
         print(f"✓ Gemma model configured: {config.GEMMA_MODEL}\n")
 
     def get_model_name(self) -> str:
         """Return the name of the model being used"""
         return config.GEMMA_MODEL
 
-    def generate_answer(self, question: str, context: str, conversation_context: str = "") -> str:
-        """Generate answer using Gemma model with context"""
+    def build_prompt(self, question: str, context: str, conversation_context: str = "") -> str:
+        """Build the Gemma prompt from retrieved context and conversation history"""
         # Include conversation context if available
         context_with_history = context
         if conversation_context:
             context_with_history = f"{conversation_context}\n\n{context}" if context else conversation_context
 
         if context_with_history.strip():
-            prompt = f"""You are a helpful assistant with access to a knowledge base.
+            return f"""You are a helpful assistant with access to a knowledge base.
 Based on the following knowledge base content, provide a clear and accurate answer to the question.
 If the context doesn't contain relevant information, say so honestly.
 
 {context_with_history}
 
 ANSWER:"""
-        else:
-            prompt = f"""Answer the following question:
+        return f"""Answer the following question:
 
 QUESTION: {question}
 
 ANSWER:"""
 
+    def generate_answer(self, question: str, context: str, conversation_context: str = "") -> str:
+        """Generate answer using Gemma model with context"""
+        prompt = self.build_prompt(question, context, conversation_context)
+
         try:
             response = self.model.generate_content(prompt)
             return response.text
         except Exception as e:
             return f"Error generating answer: {e}"
 
+    def stream_answer(self, question: str, context: str, conversation_context: str = ""):
+        """Yield the answer text piece by piece as Gemma generates it"""
+        prompt = self.build_prompt(question, context, conversation_context)
+
+        try:
+            for chunk in self.model.generate_content(prompt, stream=True):
+                yield chunk.text
+        except Exception as e:
+            yield f"Error generating answer: {e}"
+
 
 # ==============================
 # RAG SYSTEM ORCHESTRATOR
@@ -99,6 +118,7 @@ class GemmaRAGSystem(BaseRAGSystem):
         """Load markdown files into vector database"""
         chunks_loaded = self.kb_loader.load_markdown_to_db(
             overwrite_existing=overwrite_existing)
+        self.searcher.refresh_index()
         if chunks_loaded == 0:
             if overwrite_existing:
                 print("⚠ No documents reloaded. Database remains unchanged.")
@@ -113,6 +133,10 @@ class GemmaRAGSystem(BaseRAGSystem):
         """Return the name of the model being used by the RAG system"""
         return self.answer_generator.get_model_name()
 
+    def warmup(self):
+        """Warm the embedding model so the first query does not pay for it"""
+        self.embedding_manager.warmup()
+
     def answer_question(self, question: str, file_filter: Union[str, List[str]] = None, conversation_history: list = None) -> dict:
         """
         Answer a user question using the RAG pipeline
@@ -126,44 +150,10 @@ class GemmaRAGSystem(BaseRAGSystem):
         print(f"\n🔍 Processing: {question}")
         print("-" * 60)
 
-        # Prepare conversation context
-        conversation_context = ""
-        if conversation_history and len(conversation_history) > 0:
-            conversation_context = "\n\nCONVERSATION HISTORY:\n"
-            for i, qa in enumerate(conversation_history[-3:], 1):  # Last 3 exchanges for context
-                conversation_context += f"Q{i}: {qa['question']}\nA{i}: {qa['answer']}\n\n"
-            conversation_context += "CURRENT QUESTION: " + question
-            print(f"📝 Using conversation context from {len(conversation_history)} previous exchanges")
+        conversation_context = self._build_conversation_context(question, conversation_history)
 
         try:
-            # Retrieve relevant context
-            search_results = self.searcher.search(
-                question, top_k=config.TOP_K_RETRIEVAL, file_filter=file_filter)
-            search_results = set(search_results)
-            if search_results and len(search_results) > 0:
-                # Build context from search results
-                context_parts = []
-            if search_results and len(search_results) > 0:
-                # Build context from search results
-                context_parts = []
-                for chunk, file_name, similarity in search_results:
-                    if similarity > 0.1:  # Only include results with meaningful similarity
-                        context_parts.append(
-                            f"[From {file_name} (confidence: {similarity:.2%})]")
-                        context_parts.append(chunk)
-                        context_parts.append("")
-
-                context = "\n".join(context_parts)
-
-                if context.strip():
-                    print(
-                        f"📚 Retrieved {len(search_results)} relevant chunks from documentation")
-                else:
-                    print("⚠ No highly relevant content found in knowledge base")
-                    context = ""
-            else:
-                context = ""
-                print("⚠ No relevant content found in knowledge base")
+            context, search_results = self._retrieve_context(question, file_filter)
 
             # Generate answer
             print("💭 Generating answer with Gemma...")
@@ -174,14 +164,7 @@ class GemmaRAGSystem(BaseRAGSystem):
                 "question": question,
                 "answer": answer,
                 "sources_found": len(search_results),
-                "search_results": [
-                    {
-                        "file": file_name,
-                        "confidence": float(similarity),
-                        "content_preview": chunk[:100] + "..." if len(chunk) > 100 else chunk
-                    }
-                    for chunk, file_name, similarity in search_results if similarity > 0.1
-                ],
+                "search_results": self._format_search_results(search_results),
                 "timestamp": datetime.now().isoformat()
             }
 
@@ -199,33 +182,102 @@ class GemmaRAGSystem(BaseRAGSystem):
                 "timestamp": datetime.now().isoformat()
             }
 
-    def get_statistics(self) -> dict:
-        """Get database statistics"""
-        conn = sqlite3.connect(config.VECTOR_DB_FILE)
-        cursor = conn.cursor()
+    def stream_answer_question(self, question: str, file_filter: Union[str, List[str]] = None, conversation_history: list = None):
+        """
+        Stream the answer to a user question as Gemma generates it
 
-        cursor.execute("SELECT COUNT(*) FROM documents")
-        doc_count = cursor.fetchone()[0]
+        Yields dicts with a 'token' key for each piece of the answer, then a
+        final dict carrying 'sources_found' and 'search_results'
+        """
+        print(f"\n🔍 Streaming: {question}")
+        print("-" * 60)
 
-        cursor.execute("SELECT COUNT(*) FROM chunks")
-        chunk_count = cursor.fetchone()[0]
+        conversation_context = self._build_conversation_context(question, conversation_history)
 
-        cursor.execute("SELECT SUM(chunk_count) FROM documents")
-        total_chunks = cursor.fetchone()[0] or 0
+        try:
+            context, search_results = self._retrieve_context(question, file_filter)
+        except Exception as e:
+            print(f"✗ Error in stream_answer_question: {e}")
+            yield {"token": f"Error processing question: {e}"}
+            yield {"sources_found": 0, "search_results": []}
+            return
+
+        for token in self.answer_generator.stream_answer(question, context, conversation_context):
+            yield {"token": token}
+        yield {
+            "sources_found": len(search_results),
+            "search_results": self._format_search_results(search_results),
+        }
 
-        conn.close()
+    def _build_conversation_context(self, question: str, conversation_history: list = None) -> str:
+        """Format the last few Q&A exchanges as context for the current question"""
+        if not conversation_history:
+            return ""
+        parts = [f"Q{i}: {qa['question']}\nA{i}: {qa['answer']}"
+                 for i, qa in enumerate(conversation_history[-3:], 1)]  # Last 3 exchanges for context
+        print(f"📝 Using conversation context from {len(conversation_history)} previous exchanges")
+        return "\n\nCONVERSATION HISTORY:\n" + "\n\n".join(parts) + "\n\nCURRENT QUESTION: " + question
+
+    def _retrieve_context(self, question: str, file_filter: Union[str, List[str]] = None):
+        """Retrieve relevant chunks; returns the prompt context and the results it was built from"""
+        search_results = self.searcher.search(
+            question, top_k=config.TOP_K_RETRIEVAL, file_filter=file_filter)
+        # Results are already unique per file; keep only meaningful similarity
+        relevant = [(chunk, file_name, similarity) for chunk, file_name, similarity in search_results
+                    if similarity > 0.1]
+        if relevant:
+            # Build context from search results
+            context_parts = []
+            for chunk, file_name, similarity in relevant:
+                context_parts.append(
+                    f"[From {file_name} (confidence: {similarity:.2%})]")
+                context_parts.append(chunk)
+                context_parts.append("")
+            context = "\n".join(context_parts)
+            print(
+                f"📚 Retrieved {len(relevant)} relevant chunks from documentation")
+        elif search_results:
+            context = ""
+            print("⚠ No highly relevant content found in knowledge base")
+        else:
+            context = ""
+            print("⚠ No relevant content found in knowledge base")
+        return context, relevant
+
+    @staticmethod
+    def _format_search_results(search_results) -> list:
+        """Convert (chunk, file_name, similarity) results into response dicts"""
+        return [
+            {
+                "file": file_name,
+                "confidence": float(similarity),
+                "content_preview": chunk[:100] + "..." if len(chunk) > 100 else chunk
+            }
+            for chunk, file_name, similarity in search_results
+        ]
+
+    def get_statistics(self) -> dict:
+        """Get database statistics"""
+        # Counts come from the search index, which is only reloaded when the database changes
+        counts = self.searcher.index_stats()
 
         return {
-            "documents_loaded": doc_count,
-            "total_chunks": chunk_count,
-            "vector_database": config.VECTOR_DB_FILE,
+            "documents_loaded": counts["documents"],
+            "total_chunks": counts["chunks"],
+            "vector_database": self.searcher.db_file,
             "embedding_model": config.EMBEDDING_MODEL,
             "embedding_dimension": self.embedding_manager.embedding_dim
         }
 
-    def convert_code(self, question: str, conversation_history: list = None, **kwargs) -> dict:
+    async def convert_code(self, question: str, conversation_history: list = None, **kwargs) -> dict:
         """Gemma RAG System does not support code conversion."""
         return {
             "answer": "Code conversion is not supported by the Gemma RAG System. Function needs to be implemented.",
             "search_results": [],
-        }
\ No newline at end of file
+        }
+
+    async def stream_convert_code(self, question: str, conversation_history: list = None, **kwargs):
+        """Gemma RAG System does not support code conversion."""
+        result = await self.convert_code(question, conversation_history, **kwargs)
+        yield {"token": result["answer"]}
+        yield {"search_results": result["search_results"]}
\ No newline at end of file
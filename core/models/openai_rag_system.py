@@ -1,9 +1,32 @@
-from openai import OpenAI
+from functools import lru_cache
+
+import httpx
+from openai import AsyncOpenAI
 import streamlit as st
 from core.config import config
 from core.models.base_rag_system import BaseRAGSystem
 
 
+@lru_cache(maxsize=1)
+def get_openai_client() -> AsyncOpenAI:
+    """Return the process-wide OpenAI client so reloads reuse its connection pool"""
+    # HTTP/2 multiplexes concurrent requests over one TLS connection; keep-alive
+    # avoids a fresh handshake per conversion
+    http_client = httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+        timeout=httpx.Timeout(30.0, connect=5.0),
+    )
+    return AsyncOpenAI(
+        base_url="https://models.github.ai/inference",
+        api_key=config.GITHUB_PAT,
+        default_query={
+            "api-version": "2024-08-01-preview",
+        },
+        http_client=http_client,
+    )
+
+
 class OpenAIRAGSystem(BaseRAGSystem):
     """Shell to Glue conversion assistant using OpenAI."""
     
@@ -145,51 +168,25 @@ class OpenAIRAGSystem(BaseRAGSystem):
     
     def __init__(self):
         """Initialize the conversion assistant with OpenAI client."""
-        self.client = OpenAI(
-            base_url="https://models.github.ai/inference",
-            api_key=config.GITHUB_PAT,
-            default_query={
-                "api-version": "2024-08-01-preview",
-            },
-        )
+        self.client = get_openai_client()
         self.model = "openai/gpt-4.1"
+        # The system prompt never changes; build its message once and reuse it per request
+        self._base_messages = ({"role": "system", "content": self.CONVERSION_SYSTEM_PROMPT},)
     
-    def convert_code(self, question, conversation_history=None, **kwargs):
-        """Answer a conversion question using OpenAI.
-        
-        Args:
-            question: The user's question about shell to Glue conversion
-            conversation_history: List of previous Q&A pairs for context
-            **kwargs: Additional arguments (for compatibility with GemmaRAGSystem interface)
-        
-        Returns:
-            dict with 'answer' and 'search_results' keys
-        """
-        # Build messages array with system prompt and conversation history
-        messages = [
-            {
-                "role": "system",
-                "content": self.CONVERSION_SYSTEM_PROMPT,
-            }
-        ]
+    def _build_messages(self, question, conversation_history=None):
+        """Build the chat messages: system prompt, prior Q&A turns, then the question"""
+        messages = list(self._base_messages)
         
         # Add conversation history if provided
         if conversation_history:
-            for item in conversation_history:
-                messages.append({
-                    "role": "user",
-                    "content": [{
-                        "type": "text",
-                        "text": item["question"],
-                    }],
-                })
-                messages.append({
-                    "role": "assistant",
-                    "content": [{
-                        "type": "text",
-                        "text": item["answer"],
-                    }],
-                })
+            messages.extend([
+                turn
+                for item in conversation_history
+                for turn in (
+                    {"role": "user", "content": [{"type": "text", "text": item["question"]}]},
+                    {"role": "assistant", "content": [{"type": "text", "text": item["answer"]}]},
+                )
+            ])
         
         # Add current question
         messages.append({
@@ -199,10 +196,24 @@ class OpenAIRAGSystem(BaseRAGSystem):
                 "text": question,
             }],
         })
+        return messages
+
+    async def convert_code(self, question, conversation_history=None, **kwargs):
+        """Answer a conversion question using OpenAI.
+        
+        Args:
+            question: The user's question about shell to Glue conversion
+            conversation_history: List of previous Q&A pairs for context
+            **kwargs: Additional arguments (for compatibility with GemmaRAGSystem interface)
+        
+        Returns:
+            dict with 'answer' and 'search_results' keys
+        """
+        messages = self._build_messages(question, conversation_history)
         
         # Get response from OpenAI
         try:
-            response = self.client.chat.completions.create(
+            response = await self.client.chat.completions.create(
                 messages=messages,
                 model=self.model,
                 temperature=1,
@@ -220,6 +231,31 @@ class OpenAIRAGSystem(BaseRAGSystem):
                 "answer": f"Error calling OpenAI API: {str(e)}",
                 "search_results": [],
             }
+
+    async def stream_convert_code(self, question, conversation_history=None, **kwargs):
+        """Stream a conversion answer from OpenAI as it is generated.
+
+        Yields:
+            dicts with a 'token' key for each text delta, then a final dict
+            with the 'search_results' metadata
+        """
+        messages = self._build_messages(question, conversation_history)
+
+        try:
+            response = await self.client.chat.completions.create(
+                messages=messages,
+                model=self.model,
+                temperature=1,
+                top_p=1,
+                stream=True,
+            )
+            async for chunk in response:
+                if chunk.choices:
+                    yield {"token": chunk.choices[0].delta.content or ""}
+            yield {"search_results": [{"file": "OpenAI GPT-4.1 Model", "confidence": 1.0}]}
+        except Exception as e:
+            yield {"token": f"Error calling OpenAI API: {str(e)}"}
+            yield {"search_results": []}
     
     def get_statistics(self):
         """Return statistics about the conversion system."""
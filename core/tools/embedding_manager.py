@@ -5,16 +5,40 @@ import numpy as np
 from sentence_transformers import SentenceTransformer
 from core.config import config
 from typing import List
-import ssl
-import urllib.request
-import os
 
-# Disable SSL verification BEFORE other imports
-ssl._create_default_https_context = ssl._create_unverified_context
-os.environ['CURL_CA_BUNDLE'] = ''
-os.environ['REQUESTS_CA_BUNDLE'] = ''
-os.environ['SSL_CERT_FILE'] = ''
-os.environ['REQUESTS_VERIFY'] = 'False'
+# Files SentenceTransformer loads from a snapshot (configs, tokenizer, weights,
+# pooling); the ONNX/OpenVINO/TF/Rust variants and duplicate .bin weights are skipped
+MODEL_FILE_PATTERNS = ["*.json", "*.txt", "model.safetensors", "1_Pooling/*"]
+
+
+def _unverified_session():
+    """requests session for Hugging Face Hub downloads only"""
+    import requests
+    from urllib3 import disable_warnings
+    from urllib3.exceptions import InsecureRequestWarning
+
+    disable_warnings(InsecureRequestWarning)
+    session = requests.Session()
+    session.verify = False
+    return session
+
+
+def download_model(model_name: str) -> str:
+    """Fetch the model snapshot once and return its local path.
+
+    With config.VERIFY_SSL off, verification is relaxed through the Hub's own
+    HTTP backend rather than a process-wide patch. Falls back to the model
+    name, letting SentenceTransformer resolve it, if the download fails.
+    """
+    try:
+        from huggingface_hub import configure_http_backend, snapshot_download
+
+        if not config.VERIFY_SSL:
+            configure_http_backend(backend_factory=_unverified_session)
+        return snapshot_download(model_name, allow_patterns=MODEL_FILE_PATTERNS, etag_timeout=10)
+    except Exception as e:
+        print(f"⚠ Could not prefetch {model_name}, loading by name: {e}")
+        return model_name
 
 
 class EmbeddingManager:
@@ -29,25 +53,11 @@ class EmbeddingManager:
         """Load the embedding model"""
         print(f"Loading embedding model: {config.EMBEDDING_MODEL}")
         try:
-            # Disable SSL verification for model download
-            import requests
-            from requests.adapters import HTTPAdapter
-            from urllib3.util.retry import Retry
-            from urllib3 import disable_warnings
-            from urllib3.exceptions import InsecureRequestWarning
-
-            disable_warnings(InsecureRequestWarning)
-
-            # Monkey patch requests to disable SSL verification
-            original_request = requests.Session.request
-
-            def patched_request(self, method, url, **kwargs):
-                kwargs['verify'] = False
-                return original_request(self, method, url, **kwargs)
-            requests.Session.request = patched_request
-
             self.embedder = SentenceTransformer(
-                config.EMBEDDING_MODEL, device=config.DEVICE)
+                download_model(config.EMBEDDING_MODEL), device=config.DEVICE)
+            if config.DEVICE == "cuda":
+                # fp16 halves memory traffic and uses tensor cores
+                self.embedder.half()
             # Get embedding dimension from a sample
             sample_embedding = self.embedder.encode(
                 ["test"], convert_to_numpy=True)
@@ -61,7 +71,7 @@ class EmbeddingManager:
                 print("🔄 Falling back to CPU...")
                 try:
                     self.embedder = SentenceTransformer(
-                        config.EMBEDDING_MODEL, device="cpu")
+                        download_model(config.EMBEDDING_MODEL), device="cpu")
                     sample_embedding = self.embedder.encode(
                         ["test"], convert_to_numpy=True)
                     self.embedding_dim = sample_embedding.shape[1]
@@ -72,10 +82,27 @@ class EmbeddingManager:
             else:
                 raise
 
-    def encode(self, texts: List[str]) -> np.ndarray:
-        """Encode texts to embeddings"""
-        return self.embedder.encode(texts, convert_to_numpy=True)
+    @property
+    def tokenizer(self):
+        """The embedding model's Hugging Face tokenizer"""
+        return self.embedder.tokenizer
+
+    def encode(self, texts: List[str], batch_size: int = None) -> np.ndarray:
+        """Encode texts to unit-length embeddings"""
+        if batch_size is None:
+            batch_size = 64 if self.embedder.device.type == "cuda" else 32
+        return self.embedder.encode(
+            texts,
+            batch_size=batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        )
+
+    def warmup(self, batch_size: int = 8):
+        """Run one throwaway batch so kernels and tokenizer caches are ready before the first query"""
+        self.encode(["warmup"] * batch_size)
 
     def encode_single(self, text: str) -> np.ndarray:
         """Encode a single text to embedding"""
-        return self.embedder.encode([text], convert_to_numpy=True)[0]
+        return self.encode([text])[0]
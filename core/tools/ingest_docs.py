@@ -2,14 +2,106 @@
 # DOCUMENTATION LOADING
 # ==============================
 
+import copy
+import hashlib
 import os
+import re
 import requests
 import sqlite3
-from typing import List
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List
+
+import numpy as np
 
 from core.config import config
-from core.utils import utilities as utils
 from core.tools.embedding_manager import EmbeddingManager
+from core.utils import utilities as utils
+
+READ_BUFFER_SIZE = 1 << 20  # 1 MiB read buffer for markdown files
+WORD_PATTERN = re.compile(r"\S+")
+SCHEMA_VERSION = 6  # Bump when the table layout changes
+SQL_PARAM_BATCH = 500  # Host parameters per IN (...) lookup, below SQLite's limit
+READ_AHEAD_PER_WORKER = 2  # Files read and chunked ahead of the ingest loop, per read worker
+EMBED_BATCHES_IN_FLIGHT = 2  # Batches queued on the embedding thread before the ingest loop waits for it
+
+MMAP_SIZE = 256 << 20  # Let SQLite read database pages through mmap instead of pread
+
+# Statements used in the ingest loop, compiled once per connection and reused
+# from SQLite's statement cache
+INSERT_DOCUMENT_SQL = """
+    INSERT INTO documents (file_path, file_name, file_mtime, content_hash, content_compressed, chunk_count)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+INSERT_CHUNK_SQL = """
+    INSERT INTO chunks (doc_id, chunk_index, chunk_content, content_hash)
+    VALUES (?, ?, ?, ?)
+"""
+INSERT_DOC_EMBEDDINGS_SQL = """
+    INSERT INTO doc_embeddings (doc_id, n, dim, embedding_dtype, data)
+    VALUES (?, ?, ?, ?, ?)
+"""
+INSERT_CACHED_EMBEDDING_SQL = """
+    INSERT OR IGNORE INTO embedding_cache (content_hash, embedding)
+    VALUES (?, ?)
+"""
+PRUNE_EMBEDDING_CACHE_SQL = """
+    DELETE FROM embedding_cache
+    WHERE content_hash NOT IN (SELECT content_hash FROM chunks)
+"""
+
+# Packed-matrix layout: one row per document, in the order its block is written
+EMBEDDING_LAYOUT_SQL = """
+    SELECT d.id, d.content_hash, e.n, e.dim, e.embedding_dtype
+    FROM doc_embeddings e
+    JOIN documents d ON e.doc_id = d.id
+    ORDER BY d.id
+"""
+EMBEDDING_BLOCKS_SQL = """
+    SELECT e.n, e.dim, e.embedding_dtype, e.data
+    FROM doc_embeddings e
+    JOIN documents d ON e.doc_id = d.id
+    ORDER BY d.id
+"""
+
+# Chunk hashes are seeded with the model name so a model change never reuses stale vectors
+_CHUNK_HASH_SEED = hashlib.blake2b(config.EMBEDDING_MODEL.encode("utf-8"), digest_size=16)
+
+
+def chunk_hash(chunk: str) -> bytes:
+    """Return the 16-byte content hash that keys a chunk in the embedding cache"""
+    h = _CHUNK_HASH_SEED.copy()
+    h.update(chunk.encode("utf-8"))
+    return h.digest()
+
+
+# Document hashes also cover the chunking settings: re-chunking changes the stored rows
+_DOCUMENT_HASH_SEED = hashlib.blake2b(
+    f"{config.EMBEDDING_MODEL}|{config.CHUNK_SIZE}|{config.CHUNK_MAX_TOKENS}".encode("utf-8"), digest_size=16)
+
+
+def document_hash(data: bytes) -> bytes:
+    """Return the 16-byte hash used to detect changed source files"""
+    h = _DOCUMENT_HASH_SEED.copy()
+    h.update(data)
+    return h.digest()
+
+
+def chunk_bounds(spans: np.ndarray, chunk_size: int) -> np.ndarray:
+    """Character (start, end) of each word-count chunk, as an (n_chunks, 2) array
+
+    spans holds each word's (start, end) offsets. Chunks overlap by 10%, and the
+    last chunk starts before n_words - overlap; anything later would only repeat
+    the tail of the previous chunk.
+    """
+    n_words = len(spans)
+    overlap = max(1, chunk_size // 10)
+    step = chunk_size - overlap
+    first_words = np.arange(0, max(1, n_words - overlap), step)
+    last_words = np.minimum(first_words + chunk_size, n_words) - 1
+    return np.column_stack((spans[first_words, 0], spans[last_words, 1]))
 
 
 class DocumentIngestion:
@@ -19,6 +111,8 @@ class DocumentIngestion:
         self.docs_folder = docs_folder or config.DOCS_FOLDER
         self.db_file = db_file or config.VECTOR_DB_FILE
         self.embedding_manager = embedding_manager
+        # Per-thread tokenizer copies for token-bounded chunking on the read pool
+        self._local = threading.local()
         self.initialize_vector_db()
 
     def initialize_vector_db(self):
@@ -30,103 +124,321 @@ class DocumentIngestion:
 
         Args:
             overwrite_existing: If True, overwrite existing entries for files already in the database
+                whose content has changed; unchanged files are always skipped
         """
-        conn = sqlite3.connect(self.db_file)
-        cursor = conn.cursor()
-
         md_files = self.fetch_markdown_files(self.docs_folder)
         if not md_files:
             print("⚠ No markdown files found in docs folder")
-            conn.close()
             return 0
 
         print(f"\n📚 Found {len(md_files)} markdown files")
         print("=" * 60)
 
-        total_chunks_added = 0
-
+        conn = sqlite3.connect(self.db_file, isolation_level=None)
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA cache_size=-65536")
+        cursor.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        # Deleting a document cascades to its chunks and embedding block
+        cursor.execute("PRAGMA foreign_keys=ON")
+
+        # Look up every already-loaded file in one query
+        existing = {file_path: (doc_id, doc_hash) for file_path, doc_id, doc_hash
+                    in cursor.execute("SELECT file_path, id, content_hash FROM documents")}
+
+        to_load = []
         for file_path in md_files:
-            try:
-                # Check if file already exists in database
-                cursor.execute(
-                    "SELECT id FROM documents WHERE file_path = ?", (file_path,))
-                existing = cursor.fetchone()
-                if existing:
-                    if not overwrite_existing:
-                        print(
-                            f"  ⊘ Skipped (already in DB): {os.path.basename(file_path)}")
+            if file_path in existing and not overwrite_existing:
+                print(f"  ⊘ Skipped (already in DB): {os.path.basename(file_path)}")
+            else:
+                to_load.append(file_path)
+
+        # Three overlapping stages: a thread pool reads and chunks files, a single
+        # thread runs the embedding model on full batches, and this thread writes
+        # each group of documents as soon as all of its vectors are available.
+        # Identical chunk text (shared boilerplate, unchanged files) is embedded
+        # once; vectors from earlier runs come from the embedding cache.
+        batch_size = config.INGEST_BATCH_SIZE
+        vectors = {}         # chunk hash -> float32 vector, cached or embedded this run
+        scheduled = set()    # chunk hashes queued for or running through the model
+        queued = []          # (chunk hash, text) waiting for the next full batch
+        in_flight = deque()  # (chunk hashes, future) batches submitted to the model
+        waiting = deque()    # documents read but not yet written, in file order
+        total_chunks_added = 0
+        total_embedded = 0
+        total_reused = 0
+
+        # One transaction for the whole ingest, with a savepoint per file so a
+        # failing file does not undo the others
+        cursor.execute("BEGIN")
+        try:
+            n_readers = min(32, (os.cpu_count() or 1) * 4)
+            with ThreadPoolExecutor(max_workers=n_readers) as read_pool, \
+                    ThreadPoolExecutor(max_workers=1) as embed_pool:
+                # A bounded window of files is read ahead, in file order; the next
+                # file is submitted as each result is taken, so memory stays flat
+                # however large the docs tree is
+                unread = iter(to_load)
+                reads = deque()
+                for file_path in unread:
+                    reads.append((file_path, read_pool.submit(
+                        self._read_and_chunk, file_path, existing.get(file_path, (None, None))[1])))
+                    if len(reads) >= n_readers * READ_AHEAD_PER_WORKER:
+                        break
+                while reads:
+                    file_path, future = reads.popleft()
+                    next_path = next(unread, None)
+                    if next_path is not None:
+                        reads.append((next_path, read_pool.submit(
+                            self._read_and_chunk, next_path, existing.get(next_path, (None, None))[1])))
+                    try:
+                        doc = future.result()
+                    except Exception as e:
+                        print(f"  ✗ Error reading {os.path.basename(file_path)}: {e}")
                         continue
-                    else:
-                        cursor.execute(
-                            "DELETE FROM documents WHERE id = ?", (existing[0],))
-                        print(
-                            f"  ↻ Overwriting: {os.path.basename(file_path)}")
-
-                # Read file content
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read()
-
-                if not content.strip():
-                    print(f"  ⚠ Empty file: {os.path.basename(file_path)}")
-                    continue
-
-                # Chunk the content
-                chunks = self.chunk_text(content, config.CHUNK_SIZE)
-                if not chunks:
-                    print(
-                        f"  ⚠ No chunks created: {os.path.basename(file_path)}")
-                    continue
-
-                # Generate embeddings for all chunks
-                print(
-                    f"  📝 {os.path.basename(file_path)}: Creating {len(chunks)} embeddings...", end='', flush=True)
-                try:
-                    chunk_embeddings = self.embedding_manager.encode(chunks)
-                    if chunk_embeddings.shape[0] != len(chunks):
-                        print(f" ✗ Embedding shape mismatch")
+                    if doc is None:
+                        print(f"  ⊘ Unchanged: {os.path.basename(file_path)}")
+                        continue
+                    if doc['warning']:
+                        print(f"  ⚠ {doc['warning']}: {doc['file_name']}")
+                    if not doc['chunks']:
                         continue
-                except Exception as e:
-                    print(f" ✗ Error creating embeddings: {e}")
-                    continue
-
-                # Insert document
-                file_name = os.path.basename(file_path)
-                cursor.execute("""
-                    INSERT INTO documents (file_path, file_name, original_content, chunk_count)
-                    VALUES (?, ?, ?, ?)
-                """, (file_path, file_name, content, len(chunks)))
-
-                doc_id = cursor.lastrowid
-
-                # Insert chunks with embeddings
-                for chunk_index, chunk in enumerate(chunks):
-                    embedding = chunk_embeddings[chunk_index]
-                    embedding_blob = utils.embedding_to_blob(embedding)
-
-                    cursor.execute("""
-                        INSERT INTO chunks (doc_id, chunk_index, chunk_content, embedding, embedding_dim)
-                        VALUES (?, ?, ?, ?, ?)
-                    """, (doc_id, chunk_index, chunk, embedding_blob, self.embedding_manager.embedding_dim))
 
-                conn.commit()
-                total_chunks_added += len(chunks)
-                print(f" ✓ Stored {len(chunks)} chunks")
+                    doc['existing_id'] = existing.get(file_path, (None, None))[0]
+                    doc['chunk_hashes'] = [chunk_hash(chunk) for chunk in doc['chunks']]
+                    unknown = [h for h in dict.fromkeys(doc['chunk_hashes']) if h not in vectors and h not in scheduled]
+                    vectors.update(self._cached_embeddings(cursor, unknown))
+                    n_queued = len(queued)
+                    for h, chunk in zip(doc['chunk_hashes'], doc['chunks']):
+                        if h not in vectors and h not in scheduled:
+                            scheduled.add(h)
+                            queued.append((h, chunk))
+                    total_reused += len(doc['chunks']) - (len(queued) - n_queued)
+                    waiting.append(doc)
+
+                    while len(queued) >= batch_size:
+                        in_flight.append(self._submit_batch(embed_pool, queued[:batch_size]))
+                        del queued[:batch_size]
+                    # Wait for the model once it falls behind, rather than
+                    # piling up documents that are read but not yet embedded
+                    total_embedded += self._collect_embeddings(
+                        cursor, in_flight, vectors, wait=len(in_flight) > EMBED_BATCHES_IN_FLIGHT)
+                    total_chunks_added += self._write_ready(cursor, waiting, vectors)
+
+                if queued:
+                    in_flight.append(self._submit_batch(embed_pool, queued))
+                total_embedded += self._collect_embeddings(cursor, in_flight, vectors, wait=True)
+                total_chunks_added += self._write_ready(cursor, waiting, vectors)
+
+            # Drop cached vectors no longer referenced by any chunk
+            cursor.execute(PRUNE_EMBEDDING_CACHE_SQL)
+            cursor.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                cursor.execute("ROLLBACK")
+            conn.close()
+            print(f"  ✗ Error creating embeddings, no changes written: {e}")
+            import traceback
+            traceback.print_exc()
+            return 0
+        except BaseException:
+            if conn.in_transaction:
+                cursor.execute("ROLLBACK")
+            conn.close()
+            raise
 
-            except Exception as e:
-                print(f"  ✗ Error loading {os.path.basename(file_path)}: {e}")
-                import traceback
-                traceback.print_exc()
+        # After the commit, outside the transaction's error handling: the
+        # changes are written even if the packed matrix cannot be exported
+        try:
+            self._export_embedding_matrix(cursor)
+        finally:
+            conn.close()
 
-        conn.close()
+        print(f"  📝 Created {total_embedded} embeddings ({total_reused} reused)")
         print("=" * 60)
         if overwrite_existing:
             print(
-                f"✓ Documentation fully reloaded! All existing entries overwritten. ({total_chunks_added} chunks indexed)\n")
+                f"✓ Documentation fully reloaded! Changed entries overwritten, unchanged skipped. ({total_chunks_added} chunks indexed)\n")
         else:
             print(
                 f"✓ Documentation reloaded! New files added, existing skipped. ({total_chunks_added} chunks indexed)\n")
         return total_chunks_added
 
+    def _export_embedding_matrix(self, cursor: sqlite3.Cursor):
+        """Write all embedding blocks as one packed float32 matrix next to the database for the searcher to mmap"""
+        layout = cursor.execute(EMBEDDING_LAYOUT_SQL).fetchall()
+        fingerprint = utils.embedding_layout_fingerprint(layout)
+        header = utils.embedding_matrix_header(self.db_file)
+        if not layout or (header.get("fingerprint") == fingerprint
+                          and header.get("dtype") == utils.EMBEDDING_MATRIX_DTYPE):
+            return
+        try:
+            matrix = np.concatenate([
+                np.frombuffer(data, dtype=embedding_dtype).reshape(n_chunks, embedding_dim)
+                for n_chunks, embedding_dim, embedding_dtype, data in cursor.execute(EMBEDDING_BLOCKS_SQL)
+            ]).astype(np.float32)
+            # Renormalized at float32, so the rows are exactly unit length again after float16 storage
+            matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-10
+            utils.save_embedding_matrix(self.db_file, matrix, fingerprint)
+        except Exception as e:
+            # Not fatal: the searcher falls back to reading the blocks from the database
+            print(f"  ⚠ Could not write packed embedding matrix: {e}")
+
+    def _submit_batch(self, embed_pool: ThreadPoolExecutor, batch: list):
+        """Hand one batch of (hash, text) pairs to the embedding thread"""
+        hashes = [h for h, _ in batch]
+        texts = [text for _, text in batch]
+        return hashes, embed_pool.submit(self._embed_batch, texts)
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Encode one batch on the embedding thread; returns contiguous unit-length float32 rows"""
+        embeddings = self.embedding_manager.encode(texts, batch_size=config.INGEST_BATCH_SIZE)
+        assert embeddings.shape == (len(texts), self.embedding_manager.embedding_dim), "Embedding shape mismatch"
+        embeddings = np.array(embeddings, dtype=np.float32, order="C")
+        # Stored pre-normalized, so the searcher scores with a plain dot product
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-10
+        return embeddings
+
+    def _collect_embeddings(self, cursor: sqlite3.Cursor, in_flight: deque, vectors: dict, wait: bool) -> int:
+        """Take finished batches off the embedding thread and add them to the cache
+
+        Returns the number of new embeddings collected. With wait=False only
+        batches that are already done are taken, so reading keeps going.
+        """
+        collected = 0
+        while in_flight and (wait or in_flight[0][1].done()):
+            hashes, future = in_flight.popleft()
+            encoded = future.result()
+            vectors.update(zip(hashes, encoded))
+            # Cache rows are memoryview slices of the batch output, not per-row copies
+            encoded_bytes = memoryview(encoded).cast('B')
+            row_nbytes = encoded.shape[1] * encoded.itemsize
+            cursor.executemany(INSERT_CACHED_EMBEDDING_SQL, [
+                (h, encoded_bytes[i * row_nbytes:(i + 1) * row_nbytes])
+                for i, h in enumerate(hashes)
+            ])
+            collected += len(hashes)
+        return collected
+
+    def _write_ready(self, cursor: sqlite3.Cursor, waiting: deque, vectors: dict) -> int:
+        """Write the documents at the front of waiting whose vectors are all available
+
+        Returns the number of chunks stored.
+        """
+        ready = []
+        while waiting and all(h in vectors for h in waiting[0]['chunk_hashes']):
+            ready.append(waiting.popleft())
+        if not ready:
+            return 0
+
+        # Remove the documents being overwritten with a few set-based deletes
+        # instead of one per file; chunks and embedding blocks cascade
+        replaced_ids = [doc['existing_id'] for doc in ready if doc['existing_id'] is not None]
+        for i in range(0, len(replaced_ids), SQL_PARAM_BATCH):
+            batch = replaced_ids[i:i + SQL_PARAM_BATCH]
+            cursor.execute(
+                f"DELETE FROM documents WHERE id IN ({','.join('?' * len(batch))})", batch)
+
+        # The group's vectors in one contiguous buffer at storage precision;
+        # each document's BLOB is a memoryview slice of it
+        stored = np.stack([vectors[h] for doc in ready for h in doc['chunk_hashes']],
+                          dtype=config.EMBEDDING_STORAGE_DTYPE)
+        embedding_dim = stored.shape[1]
+        row_nbytes = embedding_dim * stored.itemsize
+        stored_bytes = memoryview(stored).cast('B')
+
+        chunks_added = 0
+        offset = 0
+        for doc in ready:
+            if doc['existing_id'] is not None:
+                print(f"  ↻ Overwriting: {doc['file_name']}")
+            n_chunks = len(doc['chunks'])
+            embedding_block = stored_bytes[offset * row_nbytes:(offset + n_chunks) * row_nbytes]
+            offset += n_chunks
+            cursor.execute("SAVEPOINT ingest_file")
+            try:
+                self._store_file(cursor, doc, doc['chunk_hashes'], embedding_block, embedding_dim)
+                cursor.execute("RELEASE ingest_file")
+                chunks_added += n_chunks
+            except Exception as e:
+                cursor.execute("ROLLBACK TO ingest_file")
+                cursor.execute("RELEASE ingest_file")
+                print(f"  ✗ Error loading {doc['file_name']}: {e}")
+                import traceback
+                traceback.print_exc()
+        return chunks_added
+
+    def _cached_embeddings(self, cursor: sqlite3.Cursor, hashes: List[bytes]) -> dict:
+        """Look up previously computed embeddings by chunk hash"""
+        cached = {}
+        for i in range(0, len(hashes), SQL_PARAM_BATCH):
+            batch = hashes[i:i + SQL_PARAM_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            cursor.execute(
+                f"SELECT content_hash, embedding FROM embedding_cache WHERE content_hash IN ({placeholders})",
+                batch)
+            for content_hash, blob in cursor.fetchall():
+                cached[content_hash] = np.frombuffer(blob, dtype=np.float32)
+        return cached
+
+    def _read_and_chunk(self, file_path: str, known_hash: bytes = None):
+        """Read a markdown file and split it into chunks
+
+        Runs on the read pool, so it does not print; problems are reported in
+        the returned dict's 'warning' and printed by the ingest loop in file order.
+
+        Returns:
+            dict with file_path, file_name, mtime, content_hash, content, chunks
+            and warning, or None when the file's hash equals known_hash (unchanged since last load)
+        """
+        file_name = os.path.basename(file_path)
+        # One large buffered binary read and a single decode
+        with open(file_path, 'rb', buffering=READ_BUFFER_SIZE) as f:
+            mtime = os.fstat(f.fileno()).st_mtime
+            data = f.read()
+
+        content_hash = document_hash(data)
+        if content_hash == known_hash:
+            return None
+
+        doc = {'file_path': file_path, 'file_name': file_name, 'mtime': mtime,
+               'content_hash': content_hash, 'chunks': [], 'warning': None}
+        content = doc['content'] = data.decode('utf-8', errors='ignore')
+        if not content.strip():
+            doc['warning'] = "Empty file"
+            return doc
+
+        doc['chunks'] = list(self.chunk_text(content, config.CHUNK_SIZE, config.CHUNK_MAX_TOKENS))
+        if not doc['chunks']:
+            doc['warning'] = "No chunks created"
+        return doc
+
+    def _store_file(self, cursor: sqlite3.Cursor, doc: dict, chunk_hashes: List[bytes],
+                    embedding_block: memoryview, embedding_dim: int):
+        """Insert a file's document, chunk and embedding rows
+
+        embedding_block holds the file's (n_chunks, embedding_dim) embeddings,
+        already encoded at config.EMBEDDING_STORAGE_DTYPE
+        """
+        chunks = doc['chunks']
+        # Insert document
+        # The source file stays on disk; a compressed copy is kept only on request
+        content_compressed = zlib.compress(doc['content'].encode('utf-8')) if config.STORE_DOCUMENT_CONTENT else None
+        cursor.execute(INSERT_DOCUMENT_SQL, (doc['file_path'], doc['file_name'], doc['mtime'],
+                                             doc['content_hash'], content_compressed, len(chunks)))
+
+        doc_id = cursor.lastrowid
+
+        # Chunk text rows, plus all of the document's embeddings as one
+        # contiguous (n_chunks, dim) block at the configured storage precision
+        cursor.executemany(INSERT_CHUNK_SQL, [(doc_id, chunk_index, chunk, content_hash)
+              for chunk_index, (chunk, content_hash) in enumerate(zip(chunks, chunk_hashes))])
+        cursor.execute(INSERT_DOC_EMBEDDINGS_SQL, (doc_id, len(chunks), embedding_dim,
+                                                   config.EMBEDDING_STORAGE_DTYPE, embedding_block))
+        print(f"  ✓ {doc['file_name']}: Stored {len(chunks)} chunks")
+
     # ==============================
     # DATABASE INITIALIZATION
     # ==============================
@@ -135,37 +447,74 @@ class DocumentIngestion:
         conn = sqlite3.connect(self.db_file)
         cursor = conn.cursor()
 
+        # Databases written with an older layout are rebuilt from the docs folder
+        (version,) = cursor.execute("PRAGMA user_version").fetchone()
+        if version != SCHEMA_VERSION:
+            cursor.execute("DROP TABLE IF EXISTS embedding_cache")
+            cursor.execute("DROP TABLE IF EXISTS doc_embeddings")
+            cursor.execute("DROP TABLE IF EXISTS chunks")
+            cursor.execute("DROP TABLE IF EXISTS documents")
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            # Sidecars written for a previous database must not be matched against the new one
+            utils.remove_index_sidecars(self.db_file)
+
         # Table for documents metadata
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS documents (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 file_path TEXT UNIQUE NOT NULL,
                 file_name TEXT NOT NULL,
-                original_content TEXT NOT NULL,
+                file_mtime REAL,
+                content_hash BLOB,
+                content_compressed BLOB,
                 loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 chunk_count INTEGER DEFAULT 0
             )
         """)
 
-        # Table for document chunks and their embeddings
+        # Table for document chunk text
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS chunks (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 doc_id INTEGER NOT NULL,
                 chunk_index INTEGER NOT NULL,
                 chunk_content TEXT NOT NULL,
-                embedding BLOB NOT NULL,
-                embedding_dim INTEGER NOT NULL,
+                content_hash BLOB NOT NULL,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY(doc_id) REFERENCES documents(id) ON DELETE CASCADE,
                 UNIQUE(doc_id, chunk_index)
             )
         """)
 
+        # One contiguous [n, dim] embedding block per document, stored as
+        # embedding_dtype (numpy dtype name); row i belongs to chunk_index i
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS doc_embeddings (
+                doc_id INTEGER PRIMARY KEY,
+                n INTEGER NOT NULL,
+                dim INTEGER NOT NULL,
+                embedding_dtype TEXT NOT NULL DEFAULT 'float32',
+                data BLOB NOT NULL,
+                FOREIGN KEY(doc_id) REFERENCES documents(id) ON DELETE CASCADE
+            )
+        """)
+
+        # float32 embeddings keyed by chunk_hash(), reused across files and runs
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS embedding_cache (
+                content_hash BLOB PRIMARY KEY,
+                embedding BLOB NOT NULL
+            )
+        """)
+
         # Create index for faster queries
         cursor.execute("""
             CREATE INDEX IF NOT EXISTS idx_doc_id ON chunks(doc_id)
         """)
+        # Backs the embedding-cache prune and hash lookups against chunks
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_chunks_hash ON chunks(content_hash)
+        """)
 
         conn.commit()
         conn.close()
@@ -182,30 +531,78 @@ class DocumentIngestion:
             print(f"⚠ Documentation folder not found: {folder}")
             return md_files
 
-        for root, dirs, files in os.walk(folder):
-            for file in files:
-                if file.endswith('.md'):
-                    file_path = os.path.join(root, file)
-                    md_files.append(file_path)
+        # Iterative scandir: names come straight from the directory listing and
+        # only directories need a type check, unlike os.walk's per-entry lists
+        stack = [folder]
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.name.endswith('.md') and entry.is_file():
+                        md_files.append(entry.path)
+                    elif entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
 
         return sorted(md_files)
 
-    def chunk_text(self, text: str, chunk_size: int = config.CHUNK_SIZE) -> List[str]:
-        """Split text into chunks by word count with overlap"""
-        words = text.split()
-        chunks = []
+    def chunk_text(self, text: str, chunk_size: int = config.CHUNK_SIZE, max_tokens: int = None) -> Iterator[str]:
+        """Lazily split text into chunks by word count with overlap.
 
-        # Create chunks with 10% overlap
-        overlap = max(1, chunk_size // 10)
-        step = chunk_size - overlap
-
-        for i in range(0, len(words), step):
-            chunk = " ".join(words[i:i + chunk_size])
-            if chunk.strip():
-                chunks.append(chunk)
-
-            # Stop if we're at the end
-            if i + chunk_size >= len(words):
-                break
-
-        return chunks if chunks else [text]
+        Each chunk is a single slice of the original text, from the start of
+        its first word to the end of its last, so no words list is built or joined.
+        With max_tokens, chunks are also cut to fit the embedding model's token budget.
+        """
+        spans = np.array([m.span() for m in WORD_PATTERN.finditer(text)], dtype=np.int64).reshape(-1, 2)
+        n_words = len(spans)
+        if not n_words:
+            yield text
+            return
+
+        tokenizer = self._thread_tokenizer() if max_tokens else None
+        if getattr(tokenizer, "is_fast", False):
+            yield from self._token_bounded_chunks(text, spans, chunk_size, max_tokens, tokenizer)
+            return
+
+        for start, end in chunk_bounds(spans, chunk_size).tolist():
+            yield text[start:end]
+
+    def _thread_tokenizer(self):
+        """The calling thread's own copy of the embedding model's tokenizer
+
+        Hugging Face fast tokenizers are not safe to call from several threads at
+        once ("Already borrowed"), and the embedding thread changes the shared
+        one's truncation and padding while encoding.
+        """
+        tokenizer = getattr(self._local, "tokenizer", None)
+        if tokenizer is None:
+            tokenizer = self._local.tokenizer = copy.deepcopy(self.embedding_manager.tokenizer)
+        return tokenizer
+
+    def _token_bounded_chunks(self, text: str, spans: np.ndarray, chunk_size: int,
+                              max_tokens: int, tokenizer) -> Iterator[str]:
+        """Yield chunks of at most chunk_size words that also fit in max_tokens tokens.
+
+        The text is tokenized once; cumulative token counts at each word boundary
+        then let every chunk's end be found by binary search instead of
+        re-tokenizing candidate windows. max_tokens is the model's sequence
+        limit, so the [CLS]/[SEP] tokens the model adds are reserved from it.
+        """
+        max_tokens = max(1, max_tokens - tokenizer.num_special_tokens_to_add(pair=False))
+        encoding = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+        token_starts = np.fromiter((start for start, _ in encoding["offset_mapping"]), dtype=np.int64)
+        starts, ends = spans[:, 0], spans[:, 1]
+        # Tokens beginning before word i starts, and before word i ends
+        tokens_before = np.searchsorted(token_starts, starts, side="left")
+        tokens_through = np.searchsorted(token_starts, ends, side="left")
+
+        n_words = len(spans)
+        i = 0
+        while True:
+            # Last word whose running token count still fits; always take at least one word
+            last = int(np.searchsorted(tokens_through, tokens_before[i] + max_tokens, side="right")) - 1
+            last = max(i, min(last, i + chunk_size - 1, n_words - 1))
+            yield text[starts[i]:ends[last]]
+            if last == n_words - 1:
+                return
+            n_taken = last - i + 1
+            # 10% overlap, as with word-count chunks
+            i += max(1, n_taken - max(1, n_taken // 10))
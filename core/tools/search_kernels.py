@@ -0,0 +1,41 @@
+# ==============================
+# SEARCH KERNELS
+# ==============================
+import numpy as np
+
+try:
+    from numba import njit, prange
+    HAVE_NUMBA = True
+except ImportError:  # Optional; SemanticSearcher uses its numpy path without it
+    HAVE_NUMBA = False
+
+
+# Fast-math without 'ninf'/'nnan': the kernel seeds each group's best with -inf
+# and compares against it, which those flags would make undefined
+FASTMATH_FLAGS = {"nsz", "arcp", "contract", "afn", "reassoc"}
+
+
+if HAVE_NUMBA:
+    @njit(parallel=True, fastmath=FASTMATH_FLAGS, cache=True)
+    def best_per_group(matrix, query, group_ids, n_groups):
+        """
+        Score every row against the query and keep the best row of each group
+        Returns (best similarity per group, row index of that best per group)
+        """
+        n_rows, dim = matrix.shape
+        sims = np.empty(n_rows, dtype=np.float32)
+        for i in prange(n_rows):
+            total = np.float32(0.0)
+            for j in range(dim):
+                total += matrix[i, j] * query[j]
+            sims[i] = total
+
+        # Serial pass in row order so ties keep the earliest row, as argmax does
+        best = np.full(n_groups, -np.inf, dtype=np.float32)
+        best_rows = np.full(n_groups, -1, dtype=np.int64)
+        for i in range(n_rows):
+            group = group_ids[i]
+            if sims[i] > best[group]:
+                best[group] = sims[i]
+                best_rows[group] = i
+        return best, best_rows
@@ -1,15 +1,75 @@
 # ==============================
 # SEMANTIC SEARCH & RETRIEVAL
 # ==============================
+import json
 import sqlite3
+import threading
+from dataclasses import dataclass, field
+from functools import lru_cache
 from typing import List, Tuple, Union
 import os
 
 import numpy as np
 
+try:
+    import hnswlib
+except ImportError:  # Optional; searches scan every chunk without it
+    hnswlib = None
+
 from core.config import config
 from core.utils import utilities as utils
 from core.tools.embedding_manager import EmbeddingManager
+from core.tools.search_kernels import HAVE_NUMBA, best_per_group
+
+
+ANN_OVERFETCH = 4  # Chunks fetched from the HNSW index per requested file, to survive per-file dedup
+NORM_CHECK_ROWS = 256  # Rows sampled to confirm the stored embeddings are unit length
+INT8_SCORE_BLOCK = 8192  # int8 rows widened to float32 per BLAS product (~12 MiB at 384 dims)
+NORM_TOLERANCE = 1e-2  # Allowed squared-norm error; float16 storage is only unit length to ~1e-3
+COMMON_DOCS_FOLDER = os.path.join("docs", "common")
+
+CHUNK_CONTENT_SQL = "SELECT chunk_content FROM chunks WHERE doc_id = ? AND chunk_index = ?"
+
+
+def _int8_scores(matrix: np.ndarray, scales: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Dot products of int8 rows (with per-row scales) and a float32 query
+
+    Rows are widened to float32 a block at a time so each block goes through a
+    BLAS product; an int8 x int32 product has no BLAS path and is several times slower.
+    """
+    sims = np.empty(len(matrix), dtype=np.float32)
+    for start in range(0, len(matrix), INT8_SCORE_BLOCK):
+        block = matrix[start:start + INT8_SCORE_BLOCK]
+        sims[start:start + len(block)] = block.astype(np.float32) @ query
+    return sims * scales
+
+
+@lru_cache(maxsize=4)
+def _walk_common(common_path: str, signature: tuple):
+    """.md file names and folders below common_path; signature (folder mtimes) only keys the cache"""
+    md_files = []
+    folders = []
+    for root, dirs, files in os.walk(common_path):
+        folders.append(root)
+        md_files.extend(file for file in files if file.endswith('.md'))
+    return tuple(md_files), tuple(folders)
+
+
+@dataclass(frozen=True)
+class SearchIndex:
+    """One immutable state of the search index; replaced as a whole when the database changes"""
+    signature: tuple
+    matrix: np.ndarray = None  # (N, D) unit-length rows, or int8 rows with scales; None when empty
+    scales: np.ndarray = None
+    ann: object = None
+    fingerprint: str = None
+    doc_ids: list = field(default_factory=list)
+    file_names: list = field(default_factory=list)
+    doc_offsets: np.ndarray = None
+    files: list = field(default_factory=list)  # Interned file names; row_file_ids index into it
+    row_file_ids: np.ndarray = None
+    row_docs: np.ndarray = None
+    file_to_rows: dict = field(default_factory=dict)
 
 
 class SemanticSearcher:
@@ -18,103 +78,332 @@ class SemanticSearcher:
     def __init__(self, embedding_manager: EmbeddingManager, db_file: str = None):
         self.embedding_manager = embedding_manager
         self.db_file = db_file or config.VECTOR_DB_FILE
+        self._common_folders = (COMMON_DOCS_FOLDER,)
+        # One read connection shared by every search; the lock serialises its use across threads
+        self._conn = None
+        self._conn_identity = None
+        self._db_lock = threading.Lock()
+        # Searches read self._index once and use that snapshot throughout;
+        # reloads are serialised and publish a new snapshot in one assignment
+        self._reload_lock = threading.Lock()
+        self._index = None
+        self.load_index()
 
     def _get_common_folder_files(self) -> List[str]:
         """Get all .md file names from the docs/common folder"""
-        common_path = os.path.join("docs", "common")
-        if not os.path.exists(common_path):
+        if not os.path.exists(COMMON_DOCS_FOLDER):
             return []
-        
-        # Get all .md files recursively from common folder
-        md_files = []
-        for root, dirs, files in os.walk(common_path):
-            for file in files:
-                if file.endswith('.md'):
-                    md_files.append(file)
-        
-        return md_files
 
-    def search(self, query: str, top_k: int = config.TOP_K_RETRIEVAL, file_filter: Union[str, List[str]] = None) -> List[Tuple[str, str, float]]:
+        # Re-walk only when a folder seen on the last walk has changed (a file
+        # or subfolder was added, removed or renamed directly inside it)
+        try:
+            signature = (self._common_folders, tuple(os.stat(folder).st_mtime_ns for folder in self._common_folders))
+            md_files, self._common_folders = _walk_common(COMMON_DOCS_FOLDER, signature)
+        except FileNotFoundError:  # A folder was removed; walk without caching
+            md_files, self._common_folders = _walk_common.__wrapped__(COMMON_DOCS_FOLDER, None)
+        return list(md_files)
+
+    def _db_signature(self):
+        """Identity of the database file and SQLite's data_version; None while there is no database
+
+        data_version on the held connection changes only when another connection
+        commits, so checkpoints and connections opening or closing do not count
+        as changes.
         """
-        Search for relevant chunks using semantic similarity
-        Returns list of (chunk_content, file_name, similarity_score)
+        try:
+            with self._db_lock:
+                conn = self._connection()
+                return self._conn_identity, conn.execute("PRAGMA data_version").fetchone()[0]
+        except FileNotFoundError:
+            return None
+
+    def load_index(self):
+        """Load every document's (pre-normalized) embedding block into one float32 matrix"""
+        # Taken before reading, so a commit that lands meanwhile triggers another reload
+        signature = self._db_signature()
+        layout = []
+        matrix = None
+        fingerprint = None
+        if signature is not None:
+            with self._db_lock:
+                conn = self._connection()
+                cursor = conn.cursor()
+                # One read transaction, so the layout and the blocks come from the same commit
+                cursor.execute("BEGIN")
+                try:
+                    layout = cursor.execute("""
+                        SELECT d.id, d.file_name, d.content_hash, e.n, e.dim, e.embedding_dtype
+                        FROM doc_embeddings e
+                        JOIN documents d ON e.doc_id = d.id
+                        ORDER BY d.id
+                    """).fetchall()
+                    if layout:
+                        # Prefer the packed matrix written by ingestion; read the
+                        # blocks from the database only if it is missing or stale
+                        fingerprint = utils.embedding_layout_fingerprint(
+                            (doc_id, content_hash, n, dim, dtype) for doc_id, _, content_hash, n, dim, dtype in layout)
+                        matrix = utils.load_embedding_matrix(self.db_file, fingerprint)
+                        if matrix is None:
+                            matrix = np.concatenate([
+                                np.frombuffer(data, dtype=embedding_dtype).reshape(n_chunks, embedding_dim)
+                                for n_chunks, embedding_dim, embedding_dtype, data in cursor.execute("""
+                                    SELECT e.n, e.dim, e.embedding_dtype, e.data
+                                    FROM doc_embeddings e
+                                    JOIN documents d ON e.doc_id = d.id
+                                    ORDER BY d.id
+                                """)
+                            ])
+                except sqlite3.OperationalError:
+                    # Database exists but has not been ingested into yet
+                    layout = []
+                finally:
+                    conn.rollback()
+
+        if not layout:
+            self._index = SearchIndex(signature)
+            return
+
+        # All chunks are scored by a single float32 BLAS product. The packed
+        # sidecar is already float32 and is searched through its memory map, so
+        # its pages are shared with the OS page cache; blocks read from the
+        # database (stored at lower precision) get one float32 copy
+        matrix = matrix.astype(np.float32, copy=False)
+        # Ingestion stores unit-length rows; check a sample and normalize (into
+        # a copy) only databases written without that guarantee
+        sample = matrix[::max(1, len(matrix) // NORM_CHECK_ROWS)]
+        if not np.allclose(np.einsum("ij,ij->i", sample, sample), 1.0, atol=NORM_TOLERANCE):
+            matrix = matrix / (np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-10)
+
+        ann = self._load_ann_index(matrix, fingerprint) if config.SEARCH_ANN and hnswlib is not None else None
+        scales = None
+        if config.SEARCH_INT8:
+            matrix, scales = utils.embedding_to_int8(matrix)
+        doc_ids = [row[0] for row in layout]
+        file_names = [row[1] for row in layout]
+        doc_sizes = [row[3] for row in layout]
+        # File names interned to ids, and each row's file and document
+        files, doc_file_ids = np.unique(file_names, return_inverse=True)
+        files = files.tolist()
+        row_file_ids = np.repeat(doc_file_ids, doc_sizes).astype(np.int32)
+        # Rows of each file (ascending), so a file filter can be applied before scoring
+        by_file = np.argsort(row_file_ids, kind="stable")
+        bounds = np.cumsum(np.bincount(row_file_ids, minlength=len(files)))[:-1]
+
+        # Published last, in one assignment, so a concurrent search sees either
+        # the old index or the new one, never a mix
+        self._index = SearchIndex(
+            signature=signature,
+            matrix=matrix,
+            scales=scales,
+            ann=ann,
+            fingerprint=fingerprint,
+            doc_ids=doc_ids,
+            file_names=file_names,
+            doc_offsets=np.cumsum([0] + doc_sizes[:-1]),
+            files=files,
+            row_file_ids=row_file_ids,
+            row_docs=np.repeat(np.arange(len(layout)), doc_sizes),
+            file_to_rows=dict(zip(files, np.split(by_file, bounds))),
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        """The shared read connection (caller holds _db_lock)
+
+        Opened on first use and kept open across index reloads; reopened only
+        when the database file has been replaced. Closing it would checkpoint
+        and delete the WAL, which reads as a database change.
         """
-        conn = sqlite3.connect(self.db_file)
-        cursor = conn.cursor()
+        stat = os.stat(self.db_file)
+        identity = (stat.st_dev, stat.st_ino)
+        if self._conn is None or self._conn_identity != identity:
+            if self._conn is not None:
+                self._conn.close()
+            self._conn = sqlite3.connect(self.db_file, check_same_thread=False)
+            self._conn.execute("PRAGMA cache_size=-65536")
+            self._conn.execute("PRAGMA mmap_size=268435456")
+            self._conn.execute("PRAGMA query_only=ON")
+            self._conn_identity = identity
+        return self._conn
 
-        # Encode query
-        query_embedding = self.embedding_manager.encode_single(query)
+    def refresh_index(self) -> SearchIndex:
+        """Reload the index if the database has changed since it was loaded; returns the current index"""
+        index = self._index
+        if index.signature != self._db_signature():
+            with self._reload_lock:
+                # Another thread may have reloaded while this one waited
+                if self._index.signature != self._db_signature():
+                    self.load_index()
+                index = self._index
+        return index
 
-        # Retrieve all chunks
-        cursor.execute("""
-            SELECT c.id, c.chunk_content, d.file_name, c.embedding, c.embedding_dim
-            FROM chunks c
-            JOIN documents d ON c.doc_id = d.id
-        """)
+    def index_stats(self) -> dict:
+        """Document and chunk counts of the current index"""
+        index = self.refresh_index()
+        if index.matrix is None:
+            return {"documents": 0, "chunks": 0}
+        return {"documents": len(index.doc_ids), "chunks": len(index.row_docs)}
 
-        results = cursor.fetchall()
-        conn.close()
+    def _load_ann_index(self, matrix: np.ndarray, fingerprint: str):
+        """Load the persisted HNSW index for this database state, or build and persist it"""
+        index_path = self.db_file + ".hnsw"
+        header_path = index_path + ".json"
+        index = hnswlib.Index(space="cosine", dim=matrix.shape[1])
+        try:
+            with open(header_path, "r", encoding="utf-8") as f:
+                fresh = json.load(f).get("fingerprint") == fingerprint
+            if fresh:
+                index.load_index(index_path, max_elements=matrix.shape[0])
+        except (OSError, ValueError, RuntimeError):
+            fresh = False
+        if not fresh:
+            index.init_index(max_elements=matrix.shape[0], M=16, ef_construction=200)
+            index.add_items(matrix, np.arange(matrix.shape[0]))
+            try:
+                index.save_index(index_path)
+                with open(header_path, "w", encoding="utf-8") as f:
+                    json.dump({"fingerprint": fingerprint}, f)
+            except OSError as e:
+                print(f"⚠ Could not persist HNSW index: {e}")
+        return index
 
-        if not results:
-            return []
+    def _best_per_file(self, index: SearchIndex, query_flat: np.ndarray, rows: np.ndarray = None) -> dict:
+        """Score every chunk (or only the given rows) and keep the best chunk of each file"""
+        n_files = len(index.files)
+        matrix, file_ids = index.matrix, index.row_file_ids
+        if rows is not None:
+            matrix, file_ids = matrix[rows], file_ids[rows]
 
-        # Calculate similarity scores using cosine similarity
-        similarities = []
-        for chunk_id, chunk_content, file_name, embedding_blob, embedding_dim in results:
-            chunk_embedding = utils.blob_to_embedding(
-                embedding_blob, embedding_dim)
-
-            # Flatten embeddings to 1D for dot product
-            query_flat = query_embedding.flatten()
-            chunk_flat = chunk_embedding.flatten()
-
-            # Cosine similarity
-            dot_product = np.dot(query_flat, chunk_flat)
-            norm_query = np.linalg.norm(query_flat)
-            norm_chunk = np.linalg.norm(chunk_flat)
-
-            similarity = dot_product / (norm_query * norm_chunk + 1e-10)
-            similarities.append((chunk_content, file_name, float(similarity)))
-
-        # Sort by similarity and return top-k
-        similarities.sort(key=lambda x: x[2], reverse=True)
-        if len(similarities) < top_k:
-            top_k = len(similarities)
-
-        # Group by file_name and take the chunk with max similarity for unique files
-        from collections import defaultdict
-        file_max_sim = defaultdict(lambda: {'sim': 0, 'chunk': ''})
-        for chunk_content, file_name, sim in similarities:
-            if sim > file_max_sim[file_name]['sim']:
-                file_max_sim[file_name] = {'sim': sim, 'chunk': chunk_content}
-
-        # Create unique list sorted by similarity
-        unique_similarities = [(data['chunk'], file_name, data['sim'])
-                               for file_name, data in file_max_sim.items()]
-        unique_similarities.sort(key=lambda x: x[2], reverse=True)
+        if HAVE_NUMBA and index.scales is None:
+            # Compiled kernel: parallel dot products and the per-file max in one call
+            best, best_rows = best_per_group(matrix, query_flat, file_ids, n_files)
+        else:
+            if index.scales is None:
+                sims = matrix @ query_flat
+            else:
+                scales = index.scales if rows is None else index.scales[rows]
+                sims = _int8_scores(matrix, scales, query_flat)
 
-        # Return top-k unique files
-        if len(unique_similarities) < top_k:
-            top_k = len(unique_similarities)
+            # Group-by file in numpy: the max per file, then the earliest row reaching it
+            best = np.full(n_files, -np.inf, dtype=sims.dtype)
+            np.maximum.at(best, file_ids, sims)
+            winners = np.flatnonzero(sims == best[file_ids])
+            scored_files, first = np.unique(file_ids[winners], return_index=True)
+            best_rows = np.full(n_files, -1, dtype=np.int64)
+            best_rows[scored_files] = winners[first]
+
+        if rows is not None:
+            scored = best_rows >= 0
+            best_rows[scored] = rows[best_rows[scored]]
+        return self._file_max_sim(index, best, best_rows)
+
+    def _file_max_sim(self, index: SearchIndex, best: np.ndarray, best_rows: np.ndarray) -> dict:
+        """Map per-file best similarities and rows (indexed by interned file id) to result entries"""
+        file_max_sim = {}
+        for file_name, sim, row in zip(index.files, best, best_rows):
+            if row < 0:  # File not scored
+                continue
+            doc = index.row_docs[row]
+            file_max_sim[file_name] = {'sim': float(sim), 'doc_id': index.doc_ids[doc],
+                                       'chunk_index': int(row - index.doc_offsets[doc])}
+        return file_max_sim
+
+    def _filter_rows(self, index: SearchIndex, file_filter: Union[str, List[str]]):
+        """Rows of the files named by a list or single-name filter; None means score every row"""
+        if not file_filter or file_filter == "*":
+            return None
+        names = file_filter if isinstance(file_filter, list) else [file_filter]
+        blocks = [index.file_to_rows[name] for name in dict.fromkeys(names) if name in index.file_to_rows]
+        return np.concatenate(blocks) if blocks else np.empty(0, dtype=np.int64)
 
+    def _ann_best_per_file(self, index: SearchIndex, query_flat: np.ndarray, top_k: int):
+        """Best chunk of each file among the HNSW nearest neighbours; also says whether every chunk was seen"""
+        n_rows = index.ann.get_current_count()
+        k = min(n_rows, top_k * ANN_OVERFETCH)
+        index.ann.set_ef(max(64, k))
+        labels, distances = index.ann.knn_query(query_flat, k=k)
+        labels, sims = labels[0], 1.0 - distances[0]
+
+        docs = np.searchsorted(index.doc_offsets, labels, side="right") - 1
+        file_max_sim = {}
+        for row, doc, sim in zip(labels, docs, sims):
+            file_name = index.file_names[doc]
+            sim = float(sim)
+            if file_name not in file_max_sim or sim > file_max_sim[file_name]['sim']:
+                file_max_sim[file_name] = {'sim': sim, 'doc_id': index.doc_ids[doc],
+                                           'chunk_index': int(row - index.doc_offsets[doc])}
+        return file_max_sim, k == n_rows
+
+    def _rank_files(self, file_max_sim: dict, file_filter: Union[str, List[str]] = None, top_k: int = None) -> list:
+        """Top files by best similarity, restricted to file_filter (all of them if top_k is None)"""
         # Filter by file_filter if provided
+        file_names = list(file_max_sim)
         if file_filter:
             if isinstance(file_filter, list):
-                unique_similarities = [
-                    item for item in unique_similarities if item[1] in file_filter]
+                file_names = [name for name in file_names if name in file_filter]
             else:
                 if file_filter == "*":
                     # Get all .md file names from common folder
                     common_files = self._get_common_folder_files()
-                    print(f"Found {len(common_files)} files in common folder: {common_files}")
+                    if config.SEARCH_VERBOSE:
+                        print(f"Found {len(common_files)} files in common folder: {common_files}")
                     # Filter to include only files from common folder
-                    unique_similarities = [
-                        item for item in unique_similarities if item[1] in common_files
-                    ]
+                    file_names = [name for name in file_names if name in common_files]
                 else:
-                    unique_similarities = [
-                        item for item in unique_similarities if item[1] == file_filter]
-            if len(unique_similarities) < top_k:
-                top_k = len(unique_similarities)
+                    file_names = [name for name in file_names if name == file_filter]
+
+        # Select the top-k with argpartition and sort only those; ties keep file order.
+        # Chunk text is looked up by (doc_id, chunk_index) once the final top-k is known
+        sims = np.array([file_max_sim[name]['sim'] for name in file_names], dtype=np.float64)
+        order = np.arange(len(sims))
+        if top_k is not None and len(sims) > top_k:
+            order = np.argpartition(-sims, top_k - 1)[:top_k] if top_k > 0 else order[:0]
+        order = order[np.lexsort((order, -sims[order]))]
+        ranked = []
+        for i in order:
+            data = file_max_sim[file_names[i]]
+            ranked.append(((data['doc_id'], data['chunk_index']), file_names[i], data['sim']))
+        return ranked
+
+    def search(self, query: str, top_k: int = config.TOP_K_RETRIEVAL, file_filter: Union[str, List[str]] = None) -> List[Tuple[str, str, float]]:
+        """
+        Search for relevant chunks using semantic similarity
+        Returns list of (chunk_content, file_name, similarity_score)
+        """
+        # Encode query
+        query_embedding = self.embedding_manager.encode_single(query)
+
+        # The normalized matrix is cached until the database changes; this
+        # search uses the same snapshot throughout even if a reload happens meanwhile
+        index = self.refresh_index()
+        if index.matrix is None:
+            return []
+
+        # Cosine similarity
+        query_flat = query_embedding.reshape(-1).astype(np.float32)
+        query_flat = query_flat / (np.linalg.norm(query_flat) + 1e-10)
+
+        # Only chunks of explicitly named files are scored
+        rows = self._filter_rows(index, file_filter)
+        if rows is not None and len(rows) == 0:
+            return []
+
+        unique_similarities = None
+        if index.ann is not None and rows is None:
+            file_max_sim, exhaustive = self._ann_best_per_file(index, query_flat, top_k)
+            unique_similarities = self._rank_files(file_max_sim, file_filter, top_k)
+            if len(unique_similarities) < top_k and not exhaustive:
+                # Too few files survived dedup and filtering; fall back to the exact scan
+                unique_similarities = None
+        if unique_similarities is None:
+            unique_similarities = self._rank_files(self._best_per_file(index, query_flat, rows), file_filter, top_k)
 
-        return unique_similarities[:top_k]
+        top_results = []
+        # Return top-k unique files
+        with self._db_lock:
+            for (doc_id, chunk_index), file_name, sim in unique_similarities[:top_k]:
+                row = self._conn.execute(CHUNK_CONTENT_SQL, (doc_id, chunk_index)).fetchone()
+                if row is None:
+                    # Removed by an ingestion that committed after this index was loaded
+                    continue
+                top_results.append((row[0], file_name, sim))
+        return top_results
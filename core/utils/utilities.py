@@ -1,39 +1,78 @@
+import hashlib
+import json
 import os
-import pickle
 
 import numpy as np
 
-from core.config import config
 
+def embedding_to_int8(embedding: np.ndarray):
+    """Quantize vectors (last axis) to int8 with one scale per vector; returns (values, scales)"""
+    scale = np.abs(embedding).max(axis=-1, keepdims=True) / 127.0
+    scale[scale == 0] = 1.0
+    quantized = np.round(embedding / scale).astype(np.int8)
+    return quantized, scale.squeeze(-1).astype(np.float32)
 
-def embedding_to_blob(embedding: np.ndarray) -> bytes:
-    """Convert numpy array to binary blob for storage"""
-    return embedding.astype(np.float32).tobytes()
 
+def embedding_layout_fingerprint(layout) -> str:
+    """Fingerprint of (doc_id, content_hash, n, dim, embedding_dtype) rows, in document id order"""
+    h = hashlib.blake2b(digest_size=16)
+    for doc_id, content_hash, n_chunks, embedding_dim, embedding_dtype in layout:
+        h.update(f"{doc_id}:{n_chunks}:{embedding_dim}:{embedding_dtype}:".encode("utf-8"))
+        h.update(content_hash)
+    return h.hexdigest()
 
-def blob_to_embedding(blob: bytes, dim: int) -> np.ndarray:
-    """Convert binary blob back to numpy array"""
+
+# The packed matrix is stored at search precision so the searcher can use the memory map as is
+EMBEDDING_MATRIX_DTYPE = "float32"
+
+
+def save_embedding_matrix(db_file: str, matrix: np.ndarray, fingerprint: str):
+    """Write the packed (N, D) embedding matrix next to the database, with a JSON header"""
+    matrix_path = db_file + ".emb.npy"
+    header_path = db_file + ".emb.json"
+    # Replace the matrix before the header so a reader never pairs a new header with an old matrix
+    matrix = matrix.astype(EMBEDDING_MATRIX_DTYPE, copy=False)
+    with open(matrix_path + ".tmp", "wb") as f:
+        np.save(f, matrix)
+    os.replace(matrix_path + ".tmp", matrix_path)
+    with open(header_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"fingerprint": fingerprint, "rows": matrix.shape[0], "dim": matrix.shape[1],
+                   "dtype": str(matrix.dtype)}, f)
+    os.replace(header_path + ".tmp", header_path)
+
+
+def load_embedding_matrix(db_file: str, fingerprint: str):
+    """Memory-map the packed embedding matrix if it was written for this fingerprint, else None"""
     try:
-        embedding = np.frombuffer(blob, dtype=np.float32).reshape(1, -1)
-        return embedding
-    except Exception as e:
-        print(f"⚠ Error converting blob to embedding: {e}")
-        # Return zero vector if conversion fails
-        return np.zeros((1, dim), dtype=np.float32)
-
-
-def load_or_create_embeddings():
-    """Load cached embeddings if available"""
-    if os.path.exists(config.EMBEDDINGS_CACHE) and os.path.exists(config.DOCS_CACHE):
-        print(f"Loading cached embeddings from {config.EMBEDDINGS_CACHE}...")
+        with open(db_file + ".emb.json", "r", encoding="utf-8") as f:
+            header = json.load(f)
+        if header.get("fingerprint") != fingerprint:
+            return None
+        matrix = np.load(db_file + ".emb.npy", mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    if matrix.shape != (header["rows"], header["dim"]):
+        return None
+    return matrix
+
+
+# Files derived from a vector database and stored next to it
+INDEX_SIDECAR_SUFFIXES = (".emb.npy", ".emb.json", ".hnsw", ".hnsw.json")
+
+
+def remove_index_sidecars(db_file: str):
+    """Delete the derived index files next to a database, e.g. when it is rebuilt from scratch"""
+    for suffix in INDEX_SIDECAR_SUFFIXES:
         try:
-            with open(config.EMBEDDINGS_CACHE, 'rb') as f:
-                cached_data = pickle.load(f)
-            with open(config.DOCS_CACHE, 'rb') as f:
-                cached_docs = pickle.load(f)
-            print(f"✓ Loaded {len(cached_docs)} cached document chunks")
-            return cached_data, cached_docs
-        except Exception as e:
-            print(f"⚠ Error loading cache: {e}. Will rebuild.")
-
-    return None, None
+            os.remove(db_file + suffix)
+        except FileNotFoundError:
+            pass
+
+
+def embedding_matrix_header(db_file: str) -> dict:
+    """Header (fingerprint, rows, dim, dtype) of the packed matrix, or an empty dict if there is none"""
+    try:
+        with open(db_file + ".emb.json", "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
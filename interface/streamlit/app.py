@@ -3,41 +3,92 @@ Streamlit UI for Gemma RAG System - mirrors the unrelated/app.py design
 This file provides a Streamlit frontend that calls into the project's
 `GemmaRAGSystem` backend to answer user questions from the knowledge base.
 """
-import csv
+import hmac
 import os
 from datetime import datetime
 
+import pandas as pd
 import streamlit as st
 
 from core.config import config
-from core.models.gemma_rag_system import GemmaRAGSystem
-from core.models.openai_rag_system import ConversionAssistant
 
 CSV_LOG_DIR = "logged_questions"
 CSV_LOG_FILE = os.path.join(CSV_LOG_DIR, "feedback_log.csv")
 
 
+@st.cache_resource(show_spinner="🔄 Initializing Gemma RAG System...")
+def get_rag_system(docs_folder: str = None, db_file: str = None):
+    """Build one RAG system per knowledge base, shared by every session and rerun"""
+    # Imported here so the login page renders without loading torch/transformers
+    from core.models.gemma_rag_system import GemmaRAGSystem
+    return GemmaRAGSystem(docs_folder=docs_folder, db_file=db_file)
+
+
+@st.cache_resource(show_spinner="Loading Conversion assistant...")
+def get_conversion_system():
+    """Build the conversion assistant once per process"""
+    from core.models.openai_rag_system import OpenAIRAGSystem
+    return OpenAIRAGSystem()
+
+
+# Session-state key and loader for each knowledge base choice
+KNOWLEDGE_BASES = {
+    "Leaplogic": ("system_leaplogic",
+                  lambda: get_rag_system(docs_folder="docs/leaplogic", db_file="vector_leaplogic.db")),
+    "wm-python Framework": ("system_common",
+                            lambda: get_rag_system(docs_folder="docs/common", db_file="vector_common.db")),
+    "Conversion": ("system_conversion", get_conversion_system),
+}
+
+
+def get_kb_system(kb_choice: str):
+    """Return the system for a knowledge base, loading it the first time it is selected"""
+    key, load = KNOWLEDGE_BASES[kb_choice]
+    if key not in st.session_state:
+        st.session_state[key] = load()
+    return st.session_state[key]
+
+
+CSS_FILE = os.path.join(os.path.abspath(os.path.dirname(__file__)), "static", "custom.css")
+
+
+@st.cache_data(show_spinner=False)
+def _load_css(path: str) -> str:
+    """Read a stylesheet once per process; returns an empty string if it is missing"""
+    if not os.path.exists(path):
+        return ""
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
 def apply_custom_css():
     """Load custom CSS from external file"""
-    css_file = os.path.join(os.path.dirname(__file__), "static", "custom.css")
-
-    if os.path.exists(css_file):
-        with open(css_file, "r", encoding="utf-8") as f:
-            css_content = f.read()
+    css_content = _load_css(CSS_FILE)
+    if css_content:
         st.markdown(f"<style>{css_content}</style>", unsafe_allow_html=True)
     else:
         st.warning("Custom CSS file not found. Using default styling.")
         
-def load_credentials():
-    """Load authentication credentials from Streamlit secrets"""
+
+@st.cache_data(show_spinner=False)
+def _read_credentials():
+    """Read authentication credentials from Streamlit secrets once per process; None if missing"""
     try:
         return {
             "username": st.secrets["auth"]["username"],
             "password": st.secrets["auth"]["password"]
         }
     except (KeyError, FileNotFoundError):
+        return None
+
+
+def load_credentials():
+    """Load authentication credentials from Streamlit secrets"""
+    credentials = _read_credentials()
+    if credentials is None:
         st.error("Authentication configuration not found. Please check .streamlit/secrets.toml")
         return {"username": "", "password": ""}
+    return credentials
 
 
 def login_page():
@@ -69,7 +120,10 @@ def login_page():
             if submitted:
                 credentials = load_credentials()
 
-                if username == credentials["username"] and password == credentials["password"]:
+                # Evaluate both fields so the timing does not reveal which one mismatched
+                ok = hmac.compare_digest(username.encode(), credentials["username"].encode()) & \
+                    hmac.compare_digest(password.encode(), credentials["password"].encode())
+                if ok:
                     st.session_state.logged_in = True
                     st.session_state.username = username
                     st.success("Login successful! Redirecting...")
@@ -91,16 +145,42 @@ def render_header():
     )
 
 
+# Emoji and colour shown for each normalized feedback value
+FEEDBACK_STYLE = {
+    "helpful": ("👍", "#10b981"),
+    "not helpful": ("👎", "#ef4444"),
+    "not marked": ("○", "#9ca3af"),
+}
+FEEDBACK_PAGE_SIZE = 25  # Feedback entries rendered per dashboard page
+LOG_COLUMNS = ["Question", "Answer", "Feedback", "Feedback_norm", "Sources", "Framework", "Source", "Target", "Timestamp"]
+# Export order; "Sources" is written under the "Documentation Sources" header
+CSV_COLUMNS = ["Framework", "Source", "Target", "Question", "Answer", "Feedback", "Sources", "Timestamp"]
+
+
 class QuestionLogger:
     """Question logger using session state memory only."""
 
-    def __init__(self):
-        self._init_session_storage()
-    
-    def _init_session_storage(self):
-        """Initialize session state storage for feedback logs."""
+    def init_session_storage(self):
+        """Initialize session state storage for feedback logs; safe to call on every rerun."""
         if "feedback_logs" not in st.session_state:
             st.session_state.feedback_logs = []
+            # (question, answer) -> indices into feedback_logs, oldest first
+            st.session_state.feedback_index = {}
+            st.session_state.feedback_counts = QuestionLogger._empty_counts()
+            # Bumped on every change so the DataFrame view is rebuilt only when stale
+            st.session_state.feedback_version = 0
+            st.session_state.feedback_df = None
+
+    @staticmethod
+    def _empty_counts():
+        return {"helpful": 0, "not helpful": 0, "not marked": 0}
+
+    @staticmethod
+    def _count_feedback(feedback_norm, delta):
+        """Move the running feedback counters by delta for one normalized feedback value."""
+        counts = st.session_state.feedback_counts
+        if feedback_norm in counts:
+            counts[feedback_norm] += delta
 
     def log_feedback(self, question, answer, feedback, sources=None, framework=None, source=None, target=None):
         """Log user feedback to session state memory."""
@@ -117,6 +197,7 @@ class QuestionLogger:
             "Question": question,
             "Answer": answer,
             "Feedback": feedback,
+            "Feedback_norm": feedback.strip().lower(),
             "Sources": sources_str,
             "Framework": framework or "Not Specified",
             "Source": source if framework == "Leaplogic" else "",
@@ -124,20 +205,25 @@ class QuestionLogger:
             "Timestamp": timestamp
         }
         
-        st.session_state.feedback_logs.append(log_entry)
+        logs = st.session_state.feedback_logs
+        logs.append(log_entry)
+        st.session_state.feedback_index.setdefault((question, answer), []).append(len(logs) - 1)
+        self._count_feedback(log_entry["Feedback_norm"], 1)
+        st.session_state.feedback_version += 1
     
     def get_feedback_logs(self):
         """Get all feedback logs from memory."""
-        return st.session_state.get("feedback_logs", [])
+        return st.session_state.feedback_logs
 
     def get_feedback_stats(self):
         """Get statistics from session state feedback logs."""
-        logs = self.get_feedback_logs()
-        total = len(logs)
-        positive = len([l for l in logs if l.get("Feedback", "").strip().lower() == "helpful"]) if total else 0
-        negative = len([l for l in logs if l.get("Feedback", "").strip().lower() == "not helpful"]) if total else 0
-        not_marked = len([l for l in logs if l.get("Feedback", "").strip() == "Not Marked"]) if total else 0
-        return {"total": total, "positive": positive, "negative": negative, "not_marked": not_marked}
+        counts = st.session_state.feedback_counts
+        return {
+            "total": len(self.get_feedback_logs()),
+            "positive": counts["helpful"],
+            "negative": counts["not helpful"],
+            "not_marked": counts["not marked"],
+        }
     
     def get_storage_info(self):
         """Get information about the current storage backend."""
@@ -148,58 +234,60 @@ class QuestionLogger:
     
     def update_feedback(self, question, answer, new_feedback):
         """Update feedback for an existing entry in session memory."""
-        logs = st.session_state.get("feedback_logs", [])
-        
-        # Update matching entry (find most recent match)
-        for i in range(len(logs) - 1, -1, -1):  # Start from end
-            if logs[i]["Question"] == question and logs[i]["Answer"] == answer:
-                logs[i]["Feedback"] = new_feedback
-                # Also update framework info in case it changed
-                logs[i]["Framework"] = st.session_state.get("kb_choice", "Not Specified")
-                if st.session_state.get("kb_choice") == "Leaplogic":
-                    logs[i]["Source"] = st.session_state.get("source", "Not Specified")
-                    logs[i]["Target"] = st.session_state.get("target", "Not Specified")
-                else:
-                    logs[i]["Source"] = ""
-                    logs[i]["Target"] = ""
-                break
+        indices = st.session_state.feedback_index.get((question, answer))
+        if not indices:
+            return
+
+        # Update the most recent matching entry
+        entry = st.session_state.feedback_logs[indices[-1]]
+        new_norm = new_feedback.strip().lower()
+        self._count_feedback(entry["Feedback_norm"], -1)
+        self._count_feedback(new_norm, 1)
+        entry["Feedback"] = new_feedback
+        entry["Feedback_norm"] = new_norm
+        # Also update framework info in case it changed
+        entry["Framework"] = st.session_state.kb_choice
+        if st.session_state.kb_choice == "Leaplogic":
+            entry["Source"] = st.session_state.get("source", "Not Specified")
+            entry["Target"] = st.session_state.get("target", "Not Specified")
+        else:
+            entry["Source"] = ""
+            entry["Target"] = ""
+        st.session_state.feedback_version += 1
     
     def clear_all_logs(self):
         """Clear all feedback logs from session memory."""
         st.session_state.feedback_logs = []
+        st.session_state.feedback_index = {}
+        st.session_state.feedback_counts = self._empty_counts()
+        st.session_state.feedback_version += 1
+
+    def get_feedback_frame(self):
+        """Column view of the feedback logs with normalized filter columns, rebuilt only after changes."""
+        version = st.session_state.feedback_version
+        cached = st.session_state.feedback_df
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        df = pd.DataFrame(self.get_feedback_logs(), columns=LOG_COLUMNS)
+        df["framework_norm"] = df["Framework"].fillna("").str.strip()
+        st.session_state.feedback_df = (version, df)
+        return df
     
     def export_csv(self):
         """Generate and export CSV data for download."""
-        logs = self.get_feedback_logs()
-        
-        if not logs:
-            return "Framework,Source,Target,Question,Answer,Feedback,Documentation Sources,Timestamp\n"  # Empty CSV with headers
-        
-        # Generate CSV content
-        import io
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow(["Framework", "Source", "Target", "Question", "Answer", "Feedback", "Documentation Sources", "Timestamp"])
-        
-        # Write data rows
-        for log in logs:
-            writer.writerow([
-                log.get("Framework", ""),
-                log.get("Source", ""),
-                log.get("Target", ""),
-                log.get("Question", ""),
-                log.get("Answer", ""),
-                log.get("Feedback", ""),
-                log.get("Sources", ""),
-                log.get("Timestamp", "")
-            ])
-        
-        return output.getvalue()
+        export = self.get_feedback_frame()[CSV_COLUMNS].rename(columns={"Sources": "Documentation Sources"})
+        return export.to_csv(index=False)
+
+
+@st.cache_resource
+def get_logger() -> QuestionLogger:
+    """Shared, stateless logger; each session's logs live in its own session state"""
+    return QuestionLogger()
 
 
 def render_sidebar(system):
+    processing = st.session_state.processing
     with st.sidebar:
         st.markdown("### ℹ️ About")
         st.markdown("""
@@ -212,23 +300,19 @@ def render_sidebar(system):
         st.divider()
         st.markdown("### ⚙️ Configuration")
         
-        # Model configuration box
-        st.markdown(f"""
-            <div class="stat-card" style="margin-bottom: 10px;">
-                <div class="stat-value">🤖</div>
-                <div class="stat-label">Model</div>
-                <div style="font-size: 0.8rem; color: #D57F00;">{config.GEMMA_MODEL}</div>
-            </div>
-        """, unsafe_allow_html=True)
-        
-        # Documentation configuration box
-        if st.session_state.get("db_loaded", False):
+        # Model and documentation configuration boxes, sent as one element
+        if st.session_state.db_loaded:
             stats = system.get_statistics()
             doc_info = f"{stats.get('documents_loaded', 0)} files, {stats.get('total_chunks', 0)} chunks"
         else:
             doc_info = "Not loaded"
             
         st.markdown(f"""
+            <div class="stat-card" style="margin-bottom: 10px;">
+                <div class="stat-value">🤖</div>
+                <div class="stat-label">Model</div>
+                <div style="font-size: 0.8rem; color: #D57F00;">{config.GEMMA_MODEL}</div>
+            </div>
             <div class="stat-card">
                 <div class="stat-value">📄</div>
                 <div class="stat-label">Documentation</div>
@@ -238,10 +322,9 @@ def render_sidebar(system):
         
         st.divider()
 
-        if st.session_state.get("db_loaded", False):
+        if st.session_state.db_loaded:
             st.markdown("### 📊 Statistics")
-            stats = system.get_statistics()
-            num_messages = len(st.session_state.get("messages", []))
+            num_messages = len(st.session_state.messages)
             st.markdown(f"""
                 <div class="stat-card">
                     <div class="stat-value">{num_messages}</div>
@@ -251,12 +334,14 @@ def render_sidebar(system):
 
         st.divider()
         st.markdown("### 🔧 Actions")
-        if st.button("🗑️ Clear Chat History", use_container_width=True, key="clear_chat_button", disabled=st.session_state.processing):
+        if st.button("🗑️ Clear Chat History", use_container_width=True, key="clear_chat_button", disabled=processing):
             st.session_state.messages = []
+            st.session_state.conversation_history = []
+            st.session_state.next_unlogged_idx = 0
             st.success("Chat history cleared!")
             st.rerun()
 
-        if st.button("🔄 Reload Database", use_container_width=True, key="clear_reload_button", disabled=st.session_state.processing):
+        if st.button("🔄 Reload Database", use_container_width=True, key="clear_reload_button", disabled=processing):
             with st.spinner("Reloading vector database..."):
                 try:
                     # Reload KB without overwriting existing
@@ -265,13 +350,13 @@ def render_sidebar(system):
                 except Exception as e:
                     st.error(f"Failed to reload database: {e}")
 
-        if st.button("📋 View Logged Questions", use_container_width=True, key="view_logged_questions_button", disabled=st.session_state.processing):
+        if st.button("📋 View Logged Questions", use_container_width=True, key="view_logged_questions_button", disabled=processing):
             st.session_state.show_review_dashboard = True
             st.rerun()
 
         st.divider()
         st.markdown("### 📡 Status")
-        if st.session_state.get("db_loaded", False):
+        if st.session_state.db_loaded:
             st.markdown("""
                 <div class="success-box">
                     <b>✅ System Ready</b><br>
@@ -299,26 +384,38 @@ def render_sidebar(system):
 def initialize_session_state():
     if "messages" not in st.session_state:
         st.session_state.messages = []
-    if "system" not in st.session_state:
-        with st.spinner("🔄 Initializing Gemma RAG System..."):
-            try:
-                st.session_state.system = GemmaRAGSystem()
-                st.session_state.db_loaded = True
-            except Exception as e:
-                st.error(f"Failed to initialize system: {e}")
-                st.session_state.system = None
-                st.session_state.db_loaded = False
-    if "show_review_dashboard" not in st.session_state:
-        st.session_state.show_review_dashboard = False
-    if "kb_choice" not in st.session_state:
-        st.session_state.kb_choice = "Leaplogic"
-    if "processing" not in st.session_state:
-        st.session_state.processing = False
-    if "pending_question" not in st.session_state:
-        st.session_state.pending_question = None
+        st.session_state.next_unlogged_idx = 0
+    get_logger().init_session_storage()
+    # Set by main() from the selected knowledge base
+    st.session_state.setdefault("system", None)
+    # Defaults for keys read by plain attribute access elsewhere
+    st.session_state.setdefault("db_loaded", False)
+    st.session_state.setdefault("show_review_dashboard", False)
+    st.session_state.setdefault("kb_choice", "Leaplogic")
+    st.session_state.setdefault("file_filter", None)
+    st.session_state.setdefault("processing", False)
+    st.session_state.setdefault("pending_question", None)
+
+
+# (button label, question) pairs shown on the welcome screen, two per knowledge base
+EXAMPLE_QUESTIONS = {
+    "Conversion": [
+        ("🔄 Convert a simple SELECT query", "Convert the following: select * from employees where dept='IT';"),
+        ("📝 Explain Glue conversion structure", "What is the structure of a converted Glue script?"),
+    ],
+    "Leaplogic": [
+        ("🔄 How does LeapLogic convert ZEROIFNULL function?", "How is zeroifnull function converted in Pyspark?"),
+        ("🔤 Why is derivedTable subquery created?", "Why is derivedTable subquery created?"),
+    ],
+    "Common": [
+        ("🏗️ What does the framework do?", "What does the WMG framework do?"),
+        ("⚙️ How is a query executed on Glue?", "How is a query executed on AWS Glue?"),
+    ],
+}
 
 
 def display_welcome_message():
+    processing = st.session_state.processing
     st.markdown(
         """
         <div style="text-align: center; padding: 3rem 0;">
@@ -331,8 +428,8 @@ def display_welcome_message():
     )
 
     # Get current knowledge base selection
-    kb_choice = st.session_state.get("kb_choice", "Leaplogic")
-    file_filter = st.session_state.get("file_filter")
+    kb_choice = st.session_state.kb_choice
+    file_filter = st.session_state.file_filter
     is_leaplogic = file_filter is not None or kb_choice == "Leaplogic"
 
     kb_name = "Leaplogic" if is_leaplogic else "Common Framework"
@@ -340,105 +437,88 @@ def display_welcome_message():
     st.markdown(f"### 💭 Example Questions")
     col1, col2 = st.columns(2)
 
-    # Check if conversion mode
-    is_conversion = kb_choice == "Conversion"
-
-    if is_conversion:
-        # Conversion questions
-        with col1:
-            if st.button("🔄 Convert a simple SELECT query", use_container_width=True, disabled=st.session_state.processing):
-                process_user_question(
-                    "Convert the following: select * from employees where dept='IT';")
-                st.rerun()
-        with col2:
-            if st.button("📝 Explain Glue conversion structure", use_container_width=True, disabled=st.session_state.processing):
-                process_user_question(
-                    "What is the structure of a converted Glue script?")
-                st.rerun()
-    elif is_leaplogic:
-        # Leaplogic questions
-        with col1:
-            if st.button("🔄 How does LeapLogic convert ZEROIFNULL function?", use_container_width=True, disabled=st.session_state.processing):
-                process_user_question(
-                    "How is zeroifnull function converted in Pyspark?")
-                st.rerun()
-        with col2:
-            if st.button("🔤 Why is derivedTable subquery created?", use_container_width=True, disabled=st.session_state.processing):
-                process_user_question(
-                    "Why is derivedTable subquery created?")
-                st.rerun()
-
+    # Conversion mode has its own examples; otherwise pick by knowledge base
+    if kb_choice == "Conversion":
+        examples = EXAMPLE_QUESTIONS["Conversion"]
     else:
-        # Common Framework questions
-        with col1:
-            if st.button("🏗️ What does the framework do?", use_container_width=True, disabled=st.session_state.processing):
-                process_user_question("What does the WMG framework do?")
-                st.rerun()
-        with col2:  
-            if st.button("⚙️ How is a query executed on Glue?", use_container_width=True, disabled=st.session_state.processing):
-                process_user_question("How is a query executed on AWS Glue?")
-                st.rerun()
+        examples = EXAMPLE_QUESTIONS["Leaplogic" if is_leaplogic else "Common"]
+
+    for col, (label, question) in zip((col1, col2), examples):
+        if col.button(label, use_container_width=True, disabled=processing):
+            process_user_question(question)
+            st.rerun()
 
 
 def display_chat_history():
-    for idx, message in enumerate(st.session_state.messages):
-        with st.chat_message(message["role"], avatar="👤" if message["role"] == "user" else "🤖"):
-            st.markdown(message["content"])
-            if message.get("sources"):
-                with st.expander("📚 View Sources", expanded=False):
-                    st.markdown(message["sources"])
-
-            if message["role"] == "assistant" and not message.get("feedback_given", False):
-                col1, col2, col3 = st.columns([1, 1, 8])
-                with col1:
-                    if st.button("👍", key=f"helpful_{idx}", disabled=st.session_state.processing):
-                        # Update helpful feedback in CSV
-                        if idx > 0:
-                            user_msg = st.session_state.messages[idx - 1]
-                            assistant_msg = message
-                            logger = QuestionLogger()
-                            logger.update_feedback(
-                                question=user_msg["content"],
-                                answer=assistant_msg["content"],
-                                new_feedback="helpful"
-                            )
-                        st.session_state.messages[idx]["feedback_given"] = True
-                        st.session_state.messages[idx]["feedback"] = "helpful"
-                        st.session_state.messages[idx]["logged"] = True
-                        st.rerun()
-                with col2:
-                    if st.button("👎", key=f"not_helpful_{idx}", disabled=st.session_state.processing):
-                        # Update not helpful feedback in CSV
-                        if idx > 0:
-                            user_msg = st.session_state.messages[idx - 1]
-                            assistant_msg = message
-                            logger = QuestionLogger()
-                            logger.update_feedback(
-                                question=user_msg["content"],
-                                answer=assistant_msg["content"],
-                                new_feedback="not helpful"
-                            )
-                        st.session_state.messages[idx]["feedback_given"] = True
-                        st.session_state.messages[idx]["feedback"] = "not helpful"
-                        st.session_state.messages[idx]["logged"] = True
-                        st.rerun()
-            elif message["role"] == "assistant" and message.get("feedback_given", False):
-                feedback = message.get("feedback", "")
-                if feedback == "helpful":
-                    st.caption("✓ Marked as helpful")
-                elif feedback == "not helpful":
-                    st.caption("⚠️ Marked for improvement")
-                elif feedback == "Not Marked":
-                    st.caption("○ Not marked")
+    for idx in range(len(st.session_state.messages)):
+        _render_message(idx)
+
+
+@st.fragment
+def _render_message(idx):
+    """Render one chat message; feedback clicks rerun only this fragment, not the whole script."""
+    processing = st.session_state.processing
+    message = st.session_state.messages[idx]
+    with st.chat_message(message["role"], avatar="👤" if message["role"] == "user" else "🤖"):
+        st.markdown(message["content"])
+        if message.get("sources"):
+            with st.expander("📚 View Sources", expanded=False):
+                st.markdown(message["sources"])
+
+        if message["role"] == "assistant" and not message.get("feedback_given", False):
+            col1, col2, col3 = st.columns([1, 1, 8])
+            with col1:
+                if st.button("👍", key=f"helpful_{idx}", disabled=processing):
+                    # Update helpful feedback in CSV
+                    if idx > 0:
+                        user_msg = st.session_state.messages[idx - 1]
+                        assistant_msg = message
+                        logger = get_logger()
+                        logger.update_feedback(
+                            question=user_msg["content"],
+                            answer=assistant_msg["content"],
+                            new_feedback="helpful"
+                        )
+                    st.session_state.messages[idx]["feedback_given"] = True
+                    st.session_state.messages[idx]["feedback"] = "helpful"
+                    st.session_state.messages[idx]["logged"] = True
+                    st.rerun(scope="fragment")
+            with col2:
+                if st.button("👎", key=f"not_helpful_{idx}", disabled=processing):
+                    # Update not helpful feedback in CSV
+                    if idx > 0:
+                        user_msg = st.session_state.messages[idx - 1]
+                        assistant_msg = message
+                        logger = get_logger()
+                        logger.update_feedback(
+                            question=user_msg["content"],
+                            answer=assistant_msg["content"],
+                            new_feedback="not helpful"
+                        )
+                    st.session_state.messages[idx]["feedback_given"] = True
+                    st.session_state.messages[idx]["feedback"] = "not helpful"
+                    st.session_state.messages[idx]["logged"] = True
+                    st.rerun(scope="fragment")
+        elif message["role"] == "assistant" and message.get("feedback_given", False):
+            feedback = message.get("feedback", "")
+            if feedback == "helpful":
+                st.caption("✓ Marked as helpful")
+            elif feedback == "not helpful":
+                st.caption("⚠️ Marked for improvement")
+            elif feedback == "Not Marked":
+                st.caption("○ Not marked")
 
 
 def log_unmarked_feedback():
     """Log all previous assistant messages that haven't received feedback as 'Not Marked'."""
-    logger = QuestionLogger()
+    logger = get_logger()
+    messages = st.session_state.messages
     
-    # Find all assistant messages without feedback
-    for idx in range(len(st.session_state.messages)):
-        message = st.session_state.messages[idx]
+    # Messages are append-only, so only those added since the last call need checking
+    start = st.session_state.next_unlogged_idx
+    st.session_state.next_unlogged_idx = len(messages)
+    for idx in range(start, len(messages)):
+        message = messages[idx]
         
         # Check if it's an assistant message without feedback and not already logged
         if (message["role"] == "assistant" and 
@@ -453,9 +533,9 @@ def log_unmarked_feedback():
                     answer=message["content"],
                     feedback="Not Marked",
                     sources=message.get("source_docs", []),
-                    framework=st.session_state.get("kb_choice", "Not Specified"),
-                    source=st.session_state.get("source") if st.session_state.get("kb_choice") == "Leaplogic" else None,
-                    target=st.session_state.get("target") if st.session_state.get("kb_choice") == "Leaplogic" else None
+                    framework=st.session_state.kb_choice,
+                    source=st.session_state.get("source") if st.session_state.kb_choice == "Leaplogic" else None,
+                    target=st.session_state.get("target") if st.session_state.kb_choice == "Leaplogic" else None
                 )
                 # Mark as logged and feedback given so buttons disappear
                 st.session_state.messages[idx]["logged"] = True
@@ -475,6 +555,21 @@ def format_sources(search_results):
     return "\n\n".join(lines)
 
 
+def get_conversation_history():
+    """Return the session's previous Q&A pairs, pairing each user message with the reply that follows it."""
+    if "conversation_history" not in st.session_state:
+        conversation_history = []
+        pending_user = None
+        for msg in st.session_state.messages:
+            if msg["role"] == "user":
+                pending_user = msg["content"]
+            elif msg["role"] == "assistant" and pending_user is not None:
+                conversation_history.append({"question": pending_user, "answer": msg["content"]})
+                pending_user = None
+        st.session_state.conversation_history = conversation_history
+    return st.session_state.conversation_history
+
+
 def process_user_question(question: str):
     if not question:
         return
@@ -496,25 +591,12 @@ def process_user_question(question: str):
                 try:
                     system = st.session_state.system
 
-                    # Extract conversation history (previous Q&A pairs)
-                    conversation_history = []
-                    for msg in st.session_state.messages:
-                        if msg["role"] == "user":
-                            # Find the corresponding assistant response
-                            continue
-                        elif msg["role"] == "assistant":
-                            # Pair with the previous user message
-                            user_msgs = [m for m in st.session_state.messages if m["role"] == "user"]
-                            if user_msgs and len(user_msgs) > len(conversation_history):
-                                prev_user_msg = user_msgs[len(conversation_history)]
-                                conversation_history.append({
-                                    "question": prev_user_msg["content"],
-                                    "answer": msg["content"]
-                                })
+                    # Previous Q&A pairs, maintained alongside messages
+                    conversation_history = get_conversation_history()
 
                     result = system.answer_question(
                         question,
-                        file_filter=st.session_state.get("file_filter"),
+                        file_filter=st.session_state.file_filter,
                         conversation_history=conversation_history
                     )
                     answer = result.get("answer", "")
@@ -535,18 +617,19 @@ def process_user_question(question: str):
                         "source_docs": [s.get("file") for s in search_results],
                         "feedback_given": False,
                     })
+                    conversation_history.append({"question": question, "answer": answer})
                     
                     # Log question immediately with Not Marked status
                     user_msg = st.session_state.messages[message_idx - 1]
-                    logger = QuestionLogger()
+                    logger = get_logger()
                     logger.log_feedback(
                         question=user_msg["content"],
                         answer=answer,
                         feedback="Not Marked",
                         sources=[s.get("file") for s in search_results],
-                        framework=st.session_state.get("kb_choice", "Not Specified"),
-                        source=st.session_state.get("source") if st.session_state.get("kb_choice") == "Leaplogic" else None,
-                        target=st.session_state.get("target") if st.session_state.get("kb_choice") == "Leaplogic" else None
+                        framework=st.session_state.kb_choice,
+                        source=st.session_state.get("source") if st.session_state.kb_choice == "Leaplogic" else None,
+                        target=st.session_state.get("target") if st.session_state.kb_choice == "Leaplogic" else None
                     )
 
                     # Mark the message as logged
@@ -559,7 +642,7 @@ def process_user_question(question: str):
                             # Update helpful feedback in CSV
                             user_msg = st.session_state.messages[message_idx - 1]
                             assistant_msg = st.session_state.messages[message_idx]
-                            logger = QuestionLogger()
+                            logger = get_logger()
                             logger.update_feedback(
                                 question=user_msg["content"],
                                 answer=assistant_msg["content"],
@@ -575,7 +658,7 @@ def process_user_question(question: str):
                             # Update not helpful feedback in CSV
                             user_msg = st.session_state.messages[message_idx - 1]
                             assistant_msg = st.session_state.messages[message_idx]
-                            logger = QuestionLogger()
+                            logger = get_logger()
                             logger.update_feedback(
                                 question=user_msg["content"],
                                 answer=assistant_msg["content"],
@@ -594,6 +677,7 @@ def process_user_question(question: str):
 
 
 def render_review_dashboard():
+    processing = st.session_state.processing
     st.markdown(
         """
         <div class="header-container">
@@ -604,45 +688,36 @@ def render_review_dashboard():
         unsafe_allow_html=True,
     )
 
-    if st.button("⬅️ Back to Chat", disabled=st.session_state.processing):
+    if st.button("⬅️ Back to Chat", disabled=processing):
         st.session_state.show_review_dashboard = False
         st.rerun()
 
     st.divider()
-    logger = QuestionLogger()
+    logger = get_logger()
     stats = logger.get_feedback_stats()
     logs = logger.get_feedback_logs()
 
     st.markdown("### 📊 Feedback Statistics")
-    col1, col2, col3, col4 = st.columns(4)
-    with col1:
-        st.markdown(f"""
+    st.markdown(f"""
+        <div class="stat-grid">
             <div class="stat-card">
                 <div class="stat-value">{stats['total']}</div>
                 <div class="stat-label">Total Questions</div>
             </div>
-        """, unsafe_allow_html=True)
-    with col2:
-        st.markdown(f"""
             <div class="stat-card">
                 <div class="stat-value" style="color: #10b981;">{stats['positive']}</div>
                 <div class="stat-label">Helpful</div>
             </div>
-        """, unsafe_allow_html=True)
-    with col3:
-        st.markdown(f"""
             <div class="stat-card">
                 <div class="stat-value" style="color: #ef4444;">{stats['negative']}</div>
                 <div class="stat-label">Not Helpful</div>
             </div>
-        """, unsafe_allow_html=True)
-    with col4:
-        st.markdown(f"""
             <div class="stat-card">
                 <div class="stat-value" style="color: #9ca3af;">{stats['not_marked']}</div>
                 <div class="stat-label">Not Marked</div>
             </div>
-        """, unsafe_allow_html=True)
+        </div>
+    """, unsafe_allow_html=True)
 
     st.divider()
     
@@ -660,7 +735,7 @@ def render_review_dashboard():
     
     
     # CSV Download button
-    csv_content = logger.export_csv()
+    csv_content = logger.export_csv().encode("utf-8")
     st.download_button(
         label="📥 Export to CSV",
         data=csv_content,
@@ -670,25 +745,20 @@ def render_review_dashboard():
     )
 
     # Filter logs based on selection
-    filtered_logs = logs
-    
-    # Apply feedback filter
-    if feedback_filter == "Helpful":
-        filtered_logs = [log for log in filtered_logs if log.get("Feedback", "").strip().lower() == "helpful"]
-    elif feedback_filter == "Not Helpful":
-        filtered_logs = [log for log in filtered_logs if log.get("Feedback", "").strip().lower() == "not helpful"]
-    elif feedback_filter == "Not Marked":
-        filtered_logs = [log for log in filtered_logs if log.get("Feedback", "").strip() == "Not Marked"]
-    
-    # Apply framework filter
-    if framework_filter == "Leaplogic":
-        filtered_logs = [log for log in filtered_logs if log.get("Framework", "").strip() == "Leaplogic"]
-    elif framework_filter == "wm-python Framework":
-        filtered_logs = [log for log in filtered_logs if log.get("Framework", "").strip() == "wm-python Framework"]
+    df = logger.get_feedback_frame()
+    # Combine both filters into one mask and select rows once
+    mask = pd.Series(True, index=df.index)
+    if feedback_filter != "All":
+        mask &= df.Feedback_norm == feedback_filter.lower()
+    if framework_filter != "All":
+        mask &= df.framework_norm == framework_filter
+
+    # Positions of matching logs; only the rendered page is turned back into dicts
+    filtered_rows = df.index[mask]
 
     st.divider()
     
-    if not filtered_logs:
+    if not len(filtered_rows):
         filter_desc = []
         if feedback_filter != "All":
             filter_desc.append(f"Feedback: {feedback_filter}")
@@ -703,21 +773,17 @@ def render_review_dashboard():
         if framework_filter != "All":
             filter_desc.append(framework_filter)
         filter_text = f" ({' + '.join(filter_desc)})" if filter_desc else ""
-        st.markdown(f"### 📝 Feedback Entries{filter_text} ({len(filtered_logs)})")
-        feedback_emoji = ""
-        feedback_color = ""
-        for idx, log in enumerate(reversed(filtered_logs)):
-            feedback_value = log.get("Feedback", "").strip()
-            if feedback_value.lower().strip() == "helpful":
-                feedback_emoji = "👍"
-                feedback_color = "#10b981"
-            elif feedback_value.lower().strip() == "not helpful":
-                feedback_emoji = "👎"
-                feedback_color = "#ef4444"
-            elif feedback_value.lower().strip() == "not marked":
-                feedback_emoji = "○"
-                feedback_color = "#9ca3af"
-            
+        st.markdown(f"### 📝 Feedback Entries{filter_text} ({len(filtered_rows)})")
+
+        # Render one page of entries, newest first, so the widget count stays bounded
+        page_count = max(1, -(-len(filtered_rows) // FEEDBACK_PAGE_SIZE))
+        page = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1) - 1
+        end = len(filtered_rows) - page * FEEDBACK_PAGE_SIZE
+        page_logs = [logs[i] for i in filtered_rows[max(0, end - FEEDBACK_PAGE_SIZE):end][::-1]]
+
+        for idx, log in enumerate(page_logs):
+            feedback_emoji, feedback_color = FEEDBACK_STYLE.get(log["Feedback_norm"], ("", ""))
+
             with st.expander(f"{feedback_emoji} {log.get('Question', 'No question')[:80]}...", expanded=False):
                 st.markdown(f"**❓ Question:** {log.get('Question', '')}")
                 st.markdown(f"**🤖 Answer:** {log.get('Answer', '')}")
@@ -757,23 +823,10 @@ def main():
         st.session_state.pending_question = None
         process_user_question(question)
 
-    # Initialize knowledge bases
-    if 'system_leaplogic' not in st.session_state:
-        with st.spinner("Loading Leaplogic knowledge base..."):
-            st.session_state.system_leaplogic = GemmaRAGSystem(
-                docs_folder="docs/leaplogic", db_file="vector_leaplogic.db")
-    if 'system_common' not in st.session_state:
-        with st.spinner("Loading wm-python Framework knowledge base..."):
-            st.session_state.system_common = GemmaRAGSystem(
-                docs_folder="docs/common", db_file="vector_common.db")
-    if 'system_conversion' not in st.session_state:
-        with st.spinner("Loading Conversion assistant..."):
-            st.session_state.system_conversion = ConversionAssistant()
-
     st.session_state.db_loaded = True
 
     # Check if we should show review dashboard first
-    if st.session_state.get("show_review_dashboard", False):
+    if st.session_state.show_review_dashboard:
         render_review_dashboard()
         return
 
@@ -810,22 +863,18 @@ def main():
 
     st.session_state.file_filter = file_filter
 
-    if kb_choice == "Leaplogic":
-        system = st.session_state.system_leaplogic
-    elif kb_choice == "Conversion":
-        system = st.session_state.system_conversion
-    else:
-        system = st.session_state.system_common
+    # Only the selected knowledge base is loaded; the others wait until picked
+    system = get_kb_system(kb_choice)
 
     st.session_state.system = system  # For compatibility with existing code
 
     render_header()
 
     # Only render sidebar if system is initialized
-    if st.session_state.get("system"):
+    if st.session_state.system:
         render_sidebar(st.session_state.system)
 
-    if not st.session_state.get("db_loaded", False):
+    if not st.session_state.db_loaded:
         st.markdown("""
             <div class="warning-box">
                 <p style="font-weight: bold;">⚠️ Setup Required</p>
@@ -1,6 +1,8 @@
 #!/bin/bash
 # Deploy LeapLogic RAG API on Ubuntu EC2
 # Run this script on your EC2 instance
+# Prompts for: API_KEY, GITHUB_PAT, LOGIN_ID and LOGIN_PASSWORD (required; /login
+# refuses every request without them) and PORT
 
 set -e
 
@@ -50,16 +52,33 @@ echo "🔑 Setting up environment variables..."
 echo ""
 read -p "Enter API_KEY (Google Gemini API key): " API_KEY
 read -p "Enter GITHUB_PAT (GitHub Personal Access Token): " GITHUB_PAT
+read -p "Enter LOGIN_ID (username for /login): " LOGIN_ID
+read -s -p "Enter LOGIN_PASSWORD (password for /login): " LOGIN_PASSWORD
+echo ""
+if [ -z "$LOGIN_ID" ] || [ -z "$LOGIN_PASSWORD" ]; then
+    echo "❌ Error: LOGIN_ID and LOGIN_PASSWORD are required; /login rejects every request without them"
+    exit 1
+fi
 read -p "Enter PORT (default 8000): " PORT
 PORT=${PORT:-8000}
 
+# Escape a value for a quoted systemd Environment= line (backslashes, quotes and % specifiers)
+unit_value() {
+    local value=${1//\\/\\\\}
+    value=${value//\"/\\\"}
+    printf '%s' "${value//%/%%}"
+}
+
 # Create .env file for reference
 echo "Creating .env file..."
 cat > "$PROJECT_DIR/.env" <<EOF
 API_KEY=$API_KEY
 GITHUB_PAT=$GITHUB_PAT
+LOGIN_ID=$LOGIN_ID
+LOGIN_PASSWORD=$LOGIN_PASSWORD
 PORT=$PORT
 EOF
+chmod 600 "$PROJECT_DIR/.env"
 
 echo "✅ Environment variables saved to .env file"
 
@@ -77,8 +96,10 @@ WorkingDirectory=$PROJECT_DIR
 Environment="PATH=$PROJECT_DIR/venv/bin"
 Environment="API_KEY=$API_KEY"
 Environment="GITHUB_PAT=$GITHUB_PAT"
+Environment="LOGIN_ID=$(unit_value "$LOGIN_ID")"
+Environment="LOGIN_PASSWORD=$(unit_value "$LOGIN_PASSWORD")"
 Environment="PORT=$PORT"
-ExecStart=$PROJECT_DIR/venv/bin/uvicorn communication.rest_api.app:api --host 0.0.0.0 --port $PORT
+ExecStart=$PROJECT_DIR/venv/bin/python -m communication.rest_api.server
 Restart=always
 RestartSec=10
 
@@ -99,6 +120,7 @@ echo "📋 Configuration Summary:"
 echo "  Project Directory: $PROJECT_DIR"
 echo "  API Key: ${API_KEY:0:20}..."
 echo "  GitHub PAT: ${GITHUB_PAT:0:20}..."
+echo "  Login ID: $LOGIN_ID"
 echo "  Port: $PORT"
 echo ""
 echo "Service status:"
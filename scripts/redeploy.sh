@@ -10,6 +10,7 @@ echo ""
 # Navigate to project directory
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 PROJECT_DIR="$(cd "$SCRIPT_DIR/.." && pwd)"
+. "$SCRIPT_DIR/wait_for_api.sh"
 cd "$PROJECT_DIR"
 
 echo "📁 Project directory: $PROJECT_DIR"
@@ -32,8 +33,8 @@ pip install -r "$PROJECT_DIR/requirements-py313.txt"
 echo "🔄 Restarting service..."
 sudo systemctl restart leaplogic-api
 
-# Wait a moment for service to start
-sleep 2
+# Wait until the API answers (up to 60s); exits with the recent logs if it does not
+wait_for_api 60
 
 # Check service status
 echo ""
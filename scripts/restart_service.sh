@@ -4,6 +4,9 @@
 
 set -e
 
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+. "$SCRIPT_DIR/wait_for_api.sh"
+
 echo "🔄 Restarting LeapLogic RAG API service..."
 echo ""
 
@@ -17,8 +20,8 @@ fi
 # Restart the service
 sudo systemctl restart leaplogic-api
 
-# Wait a moment for service to restart
-sleep 2
+# Wait until the API answers (up to 60s); exits with the recent logs if it does not
+wait_for_api 60
 
 # Check service status
 echo "✅ Service restarted!"
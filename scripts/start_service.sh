@@ -4,6 +4,9 @@
 
 set -e
 
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+. "$SCRIPT_DIR/wait_for_api.sh"
+
 echo "🚀 Starting LeapLogic RAG API service..."
 echo ""
 
@@ -17,8 +20,8 @@ fi
 # Start the service
 sudo systemctl start leaplogic-api
 
-# Wait a moment for service to start
-sleep 2
+# Wait until the API answers (up to 60s); exits with the recent logs if it does not
+wait_for_api 60
 
 # Check service status
 echo "✅ Service started!"
@@ -0,0 +1,24 @@
+#!/bin/bash
+# Wait for the LeapLogic RAG API to answer after a (re)start
+# Usage: source this file, then call: wait_for_api [timeout_seconds]
+
+wait_for_api() {
+    local timeout=${1:-60}
+    local port
+    port=$(systemctl show leaplogic-api --property=Environment --value | tr ' ' '\n' | sed -n 's/^PORT=//p')
+    port=${port:-8000}
+
+    # Poll every 0.1s instead of sleeping a fixed interval
+    for _ in $(seq 1 $((timeout * 10))); do
+        if curl -fs -o /dev/null "http://127.0.0.1:$port/"; then
+            return 0
+        fi
+        sleep 0.1
+    done
+
+    echo "❌ Error: leaplogic-api did not answer on port $port within ${timeout}s"
+    echo ""
+    echo "📋 Recent logs:"
+    sudo journalctl -u leaplogic-api -n 30 --no-pager
+    exit 1
+}